@@ -0,0 +1,12 @@
+import sys
+from pathlib import Path
+
+# Add the project directory to the Python path
+project_dir = Path(__file__).parent
+if str(project_dir) not in sys.path:
+    sys.path.insert(0, str(project_dir))
+
+# Import the ASGI token verification app. It serves POST /api/verify-token
+# only and runs alongside the Flask app, e.g.:
+#   uvicorn asgi:application --port 5002
+from backend.asyncverify import application
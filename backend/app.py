@@ -1,21 +1,28 @@
-from flask import Flask, request, jsonify, render_template, redirect, url_for, session
+from flask import Flask, request, jsonify, render_template, redirect, url_for, session, g, Response
 import os
+import time
 import uuid
+import hashlib
 import logging
 from pathlib import Path
 from dotenv import load_dotenv
 from functools import wraps
+from werkzeug.middleware.proxy_fix import ProxyFix
 
 # Initialize logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+from .logconfig import setup_logging
+setup_logging()
 logger = logging.getLogger('app')
 
 # Import modules
-from . import db
+from . import db, metrics, assets
+from .cache import TTLCache, MISSING
 from .login import login_user, get_user_by_id
 from .signup import signup_user
 from .gentoken import generate_token
-from .verifytoken import verify_token
+from .verifytoken import verify_token, verify_tokens, VERIFY_BATCH_MAX_TOKENS, TOKEN_VERIFY_MODE
+from .revoketoken import revoke_token, denylist
+from .keys import keyring, JWKS_MAX_AGE
 
 # Load environment variables from .env file in project root
 project_root = Path(__file__).parent.parent
@@ -28,24 +35,91 @@ app = Flask(__name__,
 
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev_secret_key')
 
+# Reverse proxies in front of the app whose X-Forwarded-For entries are trusted
+# for request.remote_addr, the address logins are throttled by. Keep it at 0
+# unless a proxy sets the header, or clients could pick their own address.
+TRUSTED_PROXY_COUNT = int(os.environ.get('TRUSTED_PROXY_COUNT', '0'))
+if TRUSTED_PROXY_COUNT:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_COUNT)
+
+# API key -> service cache, so check_api_auth doesn't hit the database on every call
+SERVICE_CACHE_SIZE = int(os.environ.get('SERVICE_CACHE_SIZE', '1024'))
+SERVICE_CACHE_TTL = float(os.environ.get('SERVICE_CACHE_TTL', '60'))
+SERVICE_CACHE_NEGATIVE_TTL = float(os.environ.get('SERVICE_CACHE_NEGATIVE_TTL', '5'))
+service_cache = TTLCache(maxsize=SERVICE_CACHE_SIZE, ttl=SERVICE_CACHE_TTL)
+
+def on_service_change(payload):
+    """Drop cached services when any worker creates, changes or deletes one"""
+    # Services change rarely, and notifications name the row rather than its API key
+    service_cache.clear()
+
+db.change_listener.on_change('registered_services', on_service_change)
+
+def collect_service_cache_metrics():
+    """Render API key cache size and hit/miss counters for /metrics"""
+    stats = service_cache.stats()
+    return [
+        "# HELP service_cache_entries API key lookups currently cached",
+        "# TYPE service_cache_entries gauge",
+        metrics.format_sample('service_cache_entries', {}, stats['size']),
+        "# HELP service_cache_requests_total API key cache lookups by result",
+        "# TYPE service_cache_requests_total counter",
+        metrics.format_sample('service_cache_requests_total', {'result': 'hit'}, stats['hits']),
+        metrics.format_sample('service_cache_requests_total', {'result': 'miss'}, stats['misses']),
+        "# HELP service_cache_evictions_total Cached lookups evicted to stay within SERVICE_CACHE_SIZE",
+        "# TYPE service_cache_evictions_total counter",
+        metrics.format_sample('service_cache_evictions_total', {}, stats['evictions'])
+    ]
+
+metrics.Collector(collect_service_cache_metrics)
+
+# Rendered login/signup pages by (template, service domain): the GET pages only
+# vary by the requesting service, so the redirect flow skips the Jinja render
+PAGE_CACHE_SIZE = int(os.environ.get('PAGE_CACHE_SIZE', '256'))
+PAGE_CACHE_TTL = float(os.environ.get('PAGE_CACHE_TTL', '3600'))
+page_cache = TTLCache(maxsize=PAGE_CACHE_SIZE, ttl=PAGE_CACHE_TTL)
+
 # Helper function to extract domain from URL
 def extract_domain(url):
     """Extract domain from URL for display purposes"""
     if not url:
         return None
-        
+    
     # Remove protocol if present
     if '://' in url:
         domain = url.split('://', 1)[1]
     else:
         domain = url
-        
+    
     # Take only the part before the first slash if there is one
     if '/' in domain:
         domain = domain.split('/', 1)[0]
-        
+    
     return domain
 
+def render_cached_page(template, service):
+    """Render a login or signup page, reusing an earlier render for the same service domain
+    
+    Responses carry an ETag and are revalidated on every view, so browsers
+    that already have the page get a 304. They are marked private since the
+    session cookie is set alongside them.
+    """
+    key = (template, service)
+    page = page_cache.get(key)
+    
+    if page is MISSING:
+        html = render_template(template, service=service)
+        page = (html, hashlib.sha256(html.encode('utf-8')).hexdigest()[:32])
+        # Edited templates should show up straight away while developing
+        if not app.jinja_env.auto_reload:
+            page_cache.set(key, page)
+    
+    html, etag = page
+    response = Response(html, mimetype='text/html')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
+
 # Replace the domain-based auth with API key auth
 def check_api_auth():
     """Check API authorization based on API key"""
@@ -59,16 +133,17 @@ def check_api_auth():
     # Look up service by API key (stored in client_secret)
     service = get_service_by_api_key(api_key)
     if not service:
-        logger.warning(f"API request with invalid API key: {api_key[:8]}...")
+        logger.warning("API request with invalid API key: %s...", api_key[:8])
         return False
     
     # Check if service is active
     if not service['is_active']:
-        logger.warning(f"API request from inactive service: {service['name']}")
+        logger.warning("API request from inactive service: %s", service['name'])
         return False
     
     # API key is valid and service is active
-    logger.info(f"Authenticated API request from service: {service['name']}")
+    logger.info("Authenticated API request from service: %s", service['name'],
+                extra={'event': 'api_authenticated'})
     return True
 
 # Add this function to each API endpoint
@@ -80,6 +155,41 @@ def api_auth_required(f):
         return f(*args, **kwargs)
     return decorated
 
+# Per-route latency for /metrics
+@app.before_request
+def start_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_duration(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.REQUEST_DURATION.observe(time.perf_counter() - started, method=request.method,
+                                         route=route, status=response.status_code)
+    return response
+
+# Public signing keys, so relying services can verify tokens locally
+@app.route('/.well-known/jwks.json')
+def jwks():
+    response = Response(keyring.jwks(), mimetype='application/json')
+    response.headers['Cache-Control'] = f'public, max-age={JWKS_MAX_AGE}'
+    response.add_etag()
+    return response.make_conditional(request)
+
+# Fingerprinted static assets built by `python manage.py build-assets`;
+# templates link to them with asset_url()
+app.jinja_env.globals['asset_url'] = assets.asset_url
+
+@app.route('/assets/<path:filename>')
+def serve_asset(filename):
+    return assets.serve_asset(filename)
+
+# Prometheus scrape endpoint
+@app.route('/metrics')
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 # Home route redirects to login
 @app.route('/')
 def home():
@@ -96,7 +206,7 @@ def login():
         # Extract domain for display purposes using the helper function
         service_domain = extract_domain(service_url)
         
-        return render_template('login.html', service=service_domain)
+        return render_cached_page('login.html', service_domain)
     
     if request.method == 'POST':
         email = request.form.get('email')
@@ -104,9 +214,15 @@ def login():
         redirect_service = session.get('redirect_service')
         
         # Use login module to authenticate
-        result = login_user(email, password, redirect_service)
+        result = login_user(email, password, redirect_service, client_ip=request.remote_addr)
         
         if not result['success']:
+            if result.get('retry_after'):
+                retry_after = str(int(result['retry_after']) + 1)
+                return render_template('login.html', error=result['error']), 429, {'Retry-After': retry_after}
+            # Password hashing is saturated; ask the client to retry shortly
+            if result.get('busy'):
+                return render_template('login.html', error=result['error']), 503, {'Retry-After': '1'}
             return render_template('login.html', error=result['error'])
         
         # If there's a service to redirect to, do it with the token
@@ -128,8 +244,8 @@ def signup():
         
         # Extract domain for display purposes using the helper function
         service_domain = extract_domain(service_url)
-                
-        return render_template('signup.html', service=service_domain)
+        
+        return render_cached_page('signup.html', service_domain)
     
     if request.method == 'POST':
         username = request.form.get('username')
@@ -141,6 +257,8 @@ def signup():
         result = signup_user(username, email, password, redirect_service)
         
         if not result['success']:
+            if result.get('busy'):
+                return render_template('signup.html', error=result['error']), 503, {'Retry-After': '1'}
             return render_template('signup.html', error=result['error'])
         
         # Log the user in
@@ -180,7 +298,8 @@ def logout():
 @app.route('/api/verify-token', methods=['POST'])
 @api_auth_required  # Add security to this endpoint
 def verify_token_endpoint():
-    token = request.json.get('token', '')
+    body = request.get_json(silent=True)
+    token = body.get('token', '') if isinstance(body, dict) else ''
     
     # Use verifytoken module to verify the token
     result = verify_token(token)
@@ -190,6 +309,38 @@ def verify_token_endpoint():
     
     return jsonify({'valid': True, 'user': result['user']})
 
+# Batch token verification endpoint for high-fanout services
+@app.route('/api/verify-tokens', methods=['POST'])
+@api_auth_required
+def verify_tokens_endpoint():
+    body = request.get_json(silent=True)
+    tokens = body.get('tokens') if isinstance(body, dict) else None
+    
+    if not isinstance(tokens, list):
+        return jsonify({'error': 'A list of tokens is required'}), 400
+    
+    if len(tokens) > VERIFY_BATCH_MAX_TOKENS:
+        return jsonify({'error': f'At most {VERIFY_BATCH_MAX_TOKENS} tokens can be verified per request'}), 400
+    
+    # Results are returned in the same order as the submitted tokens
+    results = verify_tokens(tokens)
+    
+    return jsonify({'results': results})
+
+# Token revocation endpoint, called by services when a user logs out
+@app.route('/api/revoke-token', methods=['POST'])
+@api_auth_required
+def revoke_token_endpoint():
+    body = request.get_json(silent=True)
+    token = body.get('token', '') if isinstance(body, dict) else ''
+    
+    result = revoke_token(token)
+    
+    if not result['success']:
+        return jsonify({'success': False, 'error': result['error']}), 400
+    
+    return jsonify({'success': True})
+
 # Service registration API (for admin use)
 @app.route('/api/register-service', methods=['POST'])
 def register_service():
@@ -198,18 +349,18 @@ def register_service():
     
     if not name or not domain:
         return jsonify({'error': 'Name and domain are required'}), 400
-        
+    
     # Check if service already exists
     existing_service = get_service_by_domain(domain)
     if existing_service:
         return jsonify({'error': 'Service domain already registered'}), 400
-        
+    
     # Create new service
     service_id = create_service(name, domain)
     
     if not service_id:
         return jsonify({'error': 'Failed to register service'}), 500
-        
+    
     new_service = get_service_by_domain(domain)
     
     return jsonify({
@@ -250,7 +401,15 @@ def get_service_by_domain(domain):
 
 # Add helper function to get service by API key
 def get_service_by_api_key(api_key):
-    """Get a service by API key (client_secret)"""
+    """Get a service by API key (client_secret)
+    
+    Lookups are cached in service_cache; unknown keys are cached for
+    SERVICE_CACHE_NEGATIVE_TTL seconds so repeated bad keys stay cheap.
+    """
+    service = service_cache.get(api_key)
+    if service is not MISSING:
+        return service
+    
     query = """
     SELECT id, name, domain, client_id, client_secret, created_at, is_active
     FROM registered_services
@@ -258,17 +417,21 @@ def get_service_by_api_key(api_key):
     """
     row = db.execute_query(query, (api_key,), fetchone=True)
     
-    if row:
-        return {
-            'id': row[0],
-            'name': row[1],
-            'domain': row[2],
-            'client_id': row[3],
-            'client_secret': row[4],
-            'created_at': row[5],
-            'is_active': row[6]
-        }
-    return None
+    if not row:
+        service_cache.set(api_key, None, ttl=SERVICE_CACHE_NEGATIVE_TTL)
+        return None
+    
+    service = {
+        'id': row[0],
+        'name': row[1],
+        'domain': row[2],
+        'client_id': row[3],
+        'client_secret': row[4],
+        'created_at': row[5],
+        'is_active': row[6]
+    }
+    service_cache.set(api_key, service)
+    return service
 
 # Update how we create a service to make it clear this is an API key
 def create_service(name, domain):
@@ -284,10 +447,38 @@ def create_service(name, domain):
     """
     row = db.execute_query(query, (name, domain, client_id, api_key), fetchone=True, commit=True)
     
+    # Drop any negative entry cached for this key before it existed
+    service_cache.invalidate(api_key)
+    
     if row:
         return row[0]  # Return the new service ID
     return None
 
+def set_service_active(service_id, is_active):
+    """Activate or deactivate a service (see `manage.py deactivate-service`)
+    
+    Running workers drop their cached copy on the registered_services change
+    notification, or after SERVICE_CACHE_TTL seconds without notifications.
+    
+    Returns:
+        bool: True if the service exists
+    """
+    query = """
+    UPDATE registered_services
+    SET is_active = %s
+    WHERE id = %s
+    RETURNING id
+    """
+    row = db.execute_query(query, (is_active, service_id), fetchone=True, commit=True)
+    
+    # Services change rarely, so dropping the whole cache is simplest
+    service_cache.clear()
+    
+    if row:
+        logger.info("Service %s %s", service_id, 'activated' if is_active else 'deactivated')
+        return True
+    return False
+
 # Initialize the application
 def init_app():
     """Initialize the application"""
@@ -295,6 +486,14 @@ def init_app():
         logger.error("Failed to initialize database. Exiting.")
         return False
     
+    # Stateless verification relies on the revocation denylist being kept in sync
+    if TOKEN_VERIFY_MODE == 'stateless':
+        denylist.start()
+    
+    # Invalidate cached services and verification results as soon as any worker changes them
+    if db.storage.name == 'postgres' and db.DB_NOTIFY_ENABLED:
+        db.change_listener.start()
+    
     logger.info("Application initialized successfully.")
     return True
 
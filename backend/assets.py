@@ -0,0 +1,151 @@
+import os
+import gzip
+import json
+import shutil
+import hashlib
+import logging
+import mimetypes
+from pathlib import Path
+from dotenv import load_dotenv
+from flask import request, send_file, url_for, abort
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Configure logging
+logger = logging.getLogger('assets')
+
+# Load environment variables
+project_root = Path(__file__).parent.parent
+env_path = project_root / '.env'
+load_dotenv(dotenv_path=env_path)
+
+# Built assets: every file under static/ copied to a name containing its content
+# hash, with .gz (and .br, if the brotli package is installed) variants next to
+# it, and a manifest mapping original to hashed names. Hashed names never change
+# content, so they are served with a one-year immutable Cache-Control.
+# CSS url() references are not rewritten; reference images from templates.
+ASSETS_SOURCE_DIR = project_root / 'static'
+ASSETS_BUILD_DIR = project_root / os.environ.get('ASSETS_BUILD_DIR', 'build/static')
+ASSETS_MAX_AGE = 365 * 24 * 3600
+
+# Text formats worth compressing; images are already compressed
+COMPRESSIBLE_SUFFIXES = {'.css', '.js', '.svg', '.json', '.txt', '.html', '.xml', '.ico'}
+
+# (Accept-Encoding token, file suffix), in order of preference
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+manifest = None
+
+def hashed_name(path, data):
+    """Get a file name with the content hash inserted before the suffix, e.g. style.3f2a9c1b04de.css"""
+    digest = hashlib.sha256(data).hexdigest()[:12]
+    return path.with_name(f"{path.stem}.{digest}{path.suffix}")
+
+def write_compressed(path, data):
+    """Write .gz and .br variants of a file, keeping only those smaller than the original
+    
+    Returns:
+        list: Suffixes of the variants written
+    """
+    variants = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli:
+        variants['.br'] = brotli.compress(data, quality=11)
+    
+    written = []
+    for suffix, compressed in variants.items():
+        if len(compressed) < len(data):
+            Path(f"{path}{suffix}").write_bytes(compressed)
+            written.append(suffix)
+    return written
+
+def build_assets(source_dir=ASSETS_SOURCE_DIR, build_dir=ASSETS_BUILD_DIR):
+    """Fingerprint and precompress every static file and write the manifest
+    
+    Files from earlier builds are kept, so pages rendered before a deploy can
+    still load the assets they reference.
+    
+    Returns:
+        dict: Mapping of original to hashed relative paths
+    """
+    source_dir = Path(source_dir)
+    build_dir = Path(build_dir)
+    entries = {}
+    
+    for path in sorted(source_dir.rglob('*')):
+        if not path.is_file() or build_dir in path.parents:
+            continue
+        
+        relative = path.relative_to(source_dir)
+        data = path.read_bytes()
+        target = build_dir / hashed_name(relative, data)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        
+        if not target.exists():
+            shutil.copyfile(path, target)
+            if path.suffix.lower() in COMPRESSIBLE_SUFFIXES:
+                write_compressed(target, data)
+        
+        entries[relative.as_posix()] = target.relative_to(build_dir).as_posix()
+    
+    # Written last and atomically: workers only ever see a manifest whose files exist
+    manifest_path = build_dir / 'manifest.json'
+    temp_path = manifest_path.with_suffix('.json.tmp')
+    temp_path.write_text(json.dumps(entries, indent=2, sort_keys=True) + '\n')
+    os.replace(temp_path, manifest_path)
+    
+    logger.info(f"Built {len(entries)} asset(s) into {build_dir}")
+    return entries
+
+def load_manifest():
+    """Get the asset manifest, read once per process; empty if assets weren't built"""
+    global manifest
+    
+    if manifest is None:
+        try:
+            manifest = json.loads((ASSETS_BUILD_DIR / 'manifest.json').read_text())
+        except FileNotFoundError:
+            logger.warning("No asset manifest, serving unversioned static files (run: python manage.py build-assets)")
+            manifest = {}
+    return manifest
+
+def asset_url(filename):
+    """Get the URL of a static file, fingerprinted if the assets were built
+    
+    Args:
+        filename (str): Path relative to static/, e.g. "css/style.css"
+    """
+    hashed = load_manifest().get(filename)
+    if hashed:
+        return url_for('serve_asset', filename=hashed)
+    return url_for('static', filename=filename)
+
+def serve_asset(filename):
+    """Serve a built asset, precompressed if the client accepts it
+    
+    Any file in the build directory is served, not only those in this
+    process's manifest, so assets from the previous build stay reachable.
+    """
+    path = safe_join(str(ASSETS_BUILD_DIR), filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+    
+    path = Path(path)
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    
+    encoding = None
+    for name, suffix in ENCODINGS:
+        if request.accept_encodings[name] and Path(f"{path}{suffix}").exists():
+            encoding = name
+            path = Path(f"{path}{suffix}")
+            break
+    
+    response = send_file(path, mimetype=mimetype, conditional=True, etag=True)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = f'public, max-age={ASSETS_MAX_AGE}, immutable'
+    return response
@@ -0,0 +1,259 @@
+import os
+import json
+import datetime
+import asyncio
+import logging
+import jwt
+import asyncpg
+from . import db, metrics
+from .app import service_cache, SERVICE_CACHE_NEGATIVE_TTL
+from .cache import MISSING
+from .gentoken import token_digest
+from .revoketoken import denylist
+from .verifytoken import (decode_token, verify_claims, check_token_record, check_token_type, verify_cache,
+                          cache_result, outcome_label, TOKEN_VERIFY_MODE)
+
+# Configure logging
+logger = logging.getLogger('asyncverify')
+
+# Async connection pool configuration
+ASYNC_DB_POOL_MIN = int(os.environ.get('ASYNC_DB_POOL_MIN', '1'))
+ASYNC_DB_POOL_MAX = int(os.environ.get('ASYNC_DB_POOL_MAX', '20'))
+
+# Initialize async connection pool
+async_pool = None
+denylist_task = None
+
+async def init_async_db():
+    """Initialize the asyncpg connection pool"""
+    global async_pool, denylist_task
+    
+    if db.DB_BACKEND != 'postgres':
+        raise RuntimeError("The ASGI verification app requires DB_BACKEND=postgres")
+    
+    async_pool = await asyncpg.create_pool(
+        host=db.DB_HOST,
+        port=int(db.DB_PORT),
+        database=db.DB_NAME,
+        user=db.DB_USER,
+        password=db.DB_PASSWORD,
+        min_size=ASYNC_DB_POOL_MIN,
+        max_size=ASYNC_DB_POOL_MAX,
+        # asyncpg prepares and caches statements itself; disable like the sync pool
+        statement_cache_size=100 if db.DB_PREPARE_STATEMENTS else 0
+    )
+    logger.info(f"Async database pool initialized: {db.DB_HOST}:{db.DB_PORT}/{db.DB_NAME}")
+    
+    # Stateless verification relies on the revocation denylist being kept in sync
+    if TOKEN_VERIFY_MODE == 'stateless':
+        await sync_denylist()
+        denylist_task = asyncio.create_task(run_denylist_sync())
+    
+    # Same cross-worker invalidation as the Flask app; the listener runs in its own thread
+    if db.DB_NOTIFY_ENABLED:
+        db.change_listener.start()
+
+async def close_async_db():
+    """Stop the denylist sync and change listener and close the asyncpg connection pool"""
+    if denylist_task:
+        denylist_task.cancel()
+    db.change_listener.stop()
+    if async_pool:
+        await async_pool.close()
+
+async def sync_denylist():
+    """Pull new revocations into the shared denylist"""
+    async with async_pool.acquire() as conn:
+        synced_until = await conn.fetchval("SELECT LOCALTIMESTAMP")
+        rows = await conn.fetch("""
+        SELECT jti, expires_at
+        FROM tokens
+        WHERE revoked_at > $1 AND expires_at > $2 AND jti IS NOT NULL
+        """, *denylist.sync_window())
+    
+    denylist.merge([(row['jti'], row['expires_at']) for row in rows], synced_until)
+
+async def run_denylist_sync():
+    while True:
+        await asyncio.sleep(denylist.interval)
+        try:
+            await sync_denylist()
+        except Exception as e:
+            logger.error(f"Revocation sync failed: {str(e)}")
+
+async def verify_token_async(token):
+    """Verify a JWT token without blocking the event loop on the database
+    
+    Uses the same JWT, result and caching logic as verifytoken.verify_token,
+    but looks up the token and its user in a single query.
+    
+    Args:
+        token (str): JWT token to verify
+    
+    Returns:
+        dict: Result containing validation status and user info if valid
+    """
+    result = check_token_type(token)
+    if not result:
+        digest = token_digest(token)
+        result = verify_cache.get(digest)
+        if result is MISSING:
+            result = await check_token_async(token)
+            cache_result(digest, token, result)
+    
+    # Counted like verifytoken.verify_token, so the metric covers both apps
+    metrics.VERIFICATIONS.inc(outcome=outcome_label(result))
+    return result
+
+async def check_token_async(token):
+    """Verify a JWT token against its signature and the database, bypassing the cache"""
+    result = check_token_type(token)
+    if result:
+        return result
+    
+    try:
+        payload = decode_token(token)
+        
+        if TOKEN_VERIFY_MODE == 'stateless':
+            result = verify_claims(payload)
+            if result:
+                return result
+        
+        result = check_token_record(await get_token_with_user(token))
+        if not result['valid']:
+            logger.warning("%s: %s...", result['error'], token[:20])
+        return result
+    except jwt.ExpiredSignatureError:
+        logger.warning("Token expired (JWT validation): %s...", token[:20])
+        return {'valid': False, 'error': 'Token expired'}
+    except jwt.InvalidTokenError as e:
+        logger.warning("Invalid token (%s): %s...", e, token[:20])
+        return {'valid': False, 'error': f'Invalid token: {str(e)}'}
+    except Exception as e:
+        logger.error(f"Token verification error: {str(e)}")
+        return {'valid': False, 'error': f'Verification error: {str(e)}'}
+
+async def get_token_with_user(token_value):
+    """Get a token record joined with its user, or None if the token doesn't exist"""
+    row = await async_pool.fetchrow("""
+    SELECT t.expires_at, t.revoked_at, u.id, u.username, u.email
+    FROM tokens t
+    LEFT JOIN users u ON u.id = t.user_id
+    WHERE t.token_digest = $1 AND t.expires_at > $2
+    """, token_digest(token_value), datetime.datetime.utcnow())
+    
+    if not row:
+        return None
+    
+    return {
+        'expires_at': row['expires_at'],
+        'revoked_at': row['revoked_at'],
+        'user': {
+            'id': row['id'],
+            'username': row['username'],
+            'email': row['email']
+        } if row['id'] is not None else None
+    }
+
+async def check_api_auth_async(api_key):
+    """Check API authorization based on API key, sharing the Flask app's service cache"""
+    if not api_key:
+        logger.warning("API request missing API key")
+        return False
+    
+    service = service_cache.get(api_key)
+    if service is MISSING:
+        row = await async_pool.fetchrow("""
+        SELECT id, name, domain, client_id, client_secret, created_at, is_active
+        FROM registered_services
+        WHERE client_secret = $1
+        """, api_key)
+        
+        service = dict(row) if row else None
+        if service:
+            service_cache.set(api_key, service)
+        else:
+            service_cache.set(api_key, None, ttl=SERVICE_CACHE_NEGATIVE_TTL)
+    
+    if not service:
+        logger.warning("API request with invalid API key: %s...", api_key[:8])
+        return False
+    
+    if not service['is_active']:
+        logger.warning("API request from inactive service: %s", service['name'])
+        return False
+    
+    return True
+
+async def send_json(send, status, body):
+    payload = json.dumps(body).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(payload)).encode('ascii'))
+        ]
+    })
+    await send({'type': 'http.response.body', 'body': payload})
+
+async def read_body(receive):
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            return body
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            try:
+                await init_async_db()
+            except Exception as e:
+                logger.error(f"Failed to initialize async database: {str(e)}")
+                await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                return
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await close_async_db()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+async def application(scope, receive, send):
+    """ASGI app serving POST /api/verify-token with the same contract as the Flask route"""
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+    
+    if scope['type'] != 'http':
+        return
+    
+    if scope['path'] != '/api/verify-token':
+        await send_json(send, 404, {'error': 'Not found'})
+        return
+    
+    if scope['method'] != 'POST':
+        await send_json(send, 405, {'error': 'Method not allowed'})
+        return
+    
+    headers = dict(scope['headers'])
+    api_key = headers.get(b'x-api-key', b'').decode('latin-1')
+    if not await check_api_auth_async(api_key):
+        await send_json(send, 401, {'success': False, 'error': 'Unauthorized'})
+        return
+    
+    try:
+        token = json.loads(await read_body(receive)).get('token', '')
+    except (ValueError, AttributeError):
+        await send_json(send, 400, {'error': 'Invalid JSON body'})
+        return
+    
+    result = await verify_token_async(token)
+    
+    if not result['valid']:
+        await send_json(send, 401, {'valid': False, 'error': result['error']})
+        return
+    
+    await send_json(send, 200, {'valid': True, 'user': result['user']})
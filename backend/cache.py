@@ -0,0 +1,78 @@
+import time
+import threading
+from collections import OrderedDict
+
+# Returned by TTLCache.get when a key is absent or expired, so that a cached
+# None (a negative lookup) can be told apart from a miss
+MISSING = object()
+
+class TTLCache:
+    """Thread-safe, bounded LRU cache whose entries expire after a time-to-live
+    
+    Args:
+        maxsize (int): Maximum number of entries kept; the least recently used entry is evicted first
+        ttl (float): Default time-to-live in seconds for new entries
+    """
+    
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, key, default=MISSING):
+        """Get a cached value, or default if the key is missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            
+            if entry is None:
+                self.misses += 1
+                return default
+            
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return default
+            
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+    
+    def set(self, key, value, ttl=None):
+        """Cache a value, optionally with its own time-to-live in seconds"""
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0 or self.maxsize <= 0:
+            return
+        
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def invalidate(self, key):
+        """Remove a single key from the cache"""
+        with self._lock:
+            self._entries.pop(key, None)
+    
+    def clear(self):
+        """Remove every entry from the cache"""
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self):
+        """Get cache size and hit/miss counters"""
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
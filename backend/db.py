@@ -1,12 +1,30 @@
 import os
+import re
+import json
+import time
+import select
+import random
+import hashlib
+import threading
+import datetime
 import psycopg2
-from psycopg2 import pool
+import psycopg2.extras
+import psycopg2.extensions
 from dotenv import load_dotenv
 import logging
+import logging.handlers
 from pathlib import Path
+from functools import lru_cache
+from contextlib import contextmanager
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from . import metrics
+from .pool import ConnectionPool
+from .sqlitestore import SQLiteStorage
+from .logconfig import setup_logging
 
 # Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+setup_logging()
 logger = logging.getLogger('db')
 
 # Load environment variables
@@ -14,6 +32,11 @@ project_root = Path(__file__).parent.parent
 env_path = project_root / '.env'
 load_dotenv(dotenv_path=env_path)
 
+# Storage backend: 'postgres', or 'sqlite' for single-node deployments where
+# queries run in-process against DB_SQLITE_PATH (relative to the project root)
+DB_BACKEND = os.environ.get('DB_BACKEND', 'postgres').lower()
+DB_SQLITE_PATH = project_root / os.environ.get('DB_SQLITE_PATH', 'data/auth.db')
+
 # Database configuration
 DB_HOST = os.environ.get('DB_HOST', 'localhost')
 DB_PORT = os.environ.get('DB_PORT', '5432')
@@ -21,35 +44,316 @@ DB_NAME = os.environ.get('DB_NAME', 'auth_db')
 DB_USER = os.environ.get('DB_USER', 'postgres')
 DB_PASSWORD = os.environ.get('DB_PASSWORD', 'postgres')
 
+# Connection pool configuration (timeouts and lifetimes in seconds)
+DB_POOL_MIN = int(os.environ.get('DB_POOL_MIN', '1'))
+DB_POOL_MAX = int(os.environ.get('DB_POOL_MAX', '10'))
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', '10'))
+DB_POOL_MAX_LIFETIME = float(os.environ.get('DB_POOL_MAX_LIFETIME', '3600'))
+DB_POOL_MAX_IDLE = float(os.environ.get('DB_POOL_MAX_IDLE', '600'))
+
+# Prepared statement cache. Disable it when connecting through a
+# transaction-mode pooler (e.g. PgBouncer), where session state isn't kept.
+DB_PREPARE_STATEMENTS = os.environ.get('DB_PREPARE_STATEMENTS', 'True').lower() == 'true'
+DB_PREPARED_STATEMENTS_MAX = int(os.environ.get('DB_PREPARED_STATEMENTS_MAX', '100'))
+PREPARABLE_COMMANDS = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH')
+
+# Migration configuration
+DB_AUTO_MIGRATE = os.environ.get('DB_AUTO_MIGRATE', 'True').lower() == 'true'
+MIGRATIONS_DIR = Path(__file__).parent / 'migrations'
+MIGRATION_LOCK_ID = 7210431  # Advisory lock key so only one worker migrates at a time
+
+# Tokens partition maintenance: daily partitions are created this many days
+# ahead and dropped once every token in them has been expired this long
+TOKEN_PARTITION_DAYS_AHEAD = int(os.environ.get('TOKEN_PARTITION_DAYS_AHEAD', '7'))
+TOKEN_PARTITION_RETAIN_DAYS = int(os.environ.get('TOKEN_PARTITION_RETAIN_DAYS', '1'))
+
+# Slow-query log: statements slower than DB_SLOW_QUERY_MS (0 disables) are logged
+# with a fingerprint and redacted parameters. A DB_SLOW_QUERY_EXPLAIN_SAMPLE
+# fraction of slow SELECTs is re-run under EXPLAIN (ANALYZE, BUFFERS) in the
+# background and the plan written to a rotating file.
+DB_SLOW_QUERY_MS = float(os.environ.get('DB_SLOW_QUERY_MS', '200'))
+DB_SLOW_QUERY_EXPLAIN_SAMPLE = float(os.environ.get('DB_SLOW_QUERY_EXPLAIN_SAMPLE', '0'))
+DB_SLOW_QUERY_EXPLAIN_FILE = project_root / os.environ.get('DB_SLOW_QUERY_EXPLAIN_FILE', 'logs/query_plans.log')
+DB_SLOW_QUERY_EXPLAIN_QUEUE_MAX = 16
+
+# Cross-worker cache invalidation: triggers added by migration 0008 send a
+# notification on DB_NOTIFY_CHANNEL whenever a write makes cached services,
+# users or token verification results stale, and every worker LISTENs for them
+DB_NOTIFY_ENABLED = os.environ.get('DB_NOTIFY_ENABLED', 'True').lower() == 'true'
+DB_NOTIFY_CHANNEL = 'auth_changes'
+DB_NOTIFY_RECONNECT_MAX = 30  # Longest wait in seconds between reconnect attempts
+
 # Initialize connection pool
 connection_pool = None
 
-def init_db():
-    """Initialize the database connection pool"""
-    global connection_pool
+# EXPLAIN captures run one at a time off the request path; extras are dropped
+explain_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='explain')
+explain_slots = threading.BoundedSemaphore(DB_SLOW_QUERY_EXPLAIN_QUEUE_MAX)
+plan_logger = None
+
+class PreparingConnection(psycopg2.extensions.connection):
+    """Connection that remembers which statements it has prepared, in LRU order"""
     
-    try:
-        connection_pool = psycopg2.pool.SimpleConnectionPool(
-            1, 10,
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = OrderedDict()
+
+class PostgresStorage:
+    """Postgres storage through the shared connection pool"""
+    
+    name = 'postgres'
+    
+    def connect(self):
+        """Open the connection pool"""
+        global connection_pool
+        
+        connection_pool = ConnectionPool(
+            DB_POOL_MIN, DB_POOL_MAX,
+            timeout=DB_POOL_TIMEOUT,
+            max_lifetime=DB_POOL_MAX_LIFETIME,
+            max_idle=DB_POOL_MAX_IDLE,
             host=DB_HOST,
             port=DB_PORT,
             database=DB_NAME,
             user=DB_USER,
-            password=DB_PASSWORD
+            password=DB_PASSWORD,
+            connection_factory=PreparingConnection
         )
         
         logger.info(f"Database pool initialized: {DB_HOST}:{DB_PORT}/{DB_NAME}")
+    
+    def execute(self, query, params=None, fetchone=False, fetchall=False, commit=False):
+        """Execute a query on a pooled connection, with the same contract as execute_query"""
+        conn = get_connection()
+        cursor = None
+        result = None
+        
+        try:
+            cursor = conn.cursor()
+            
+            execute_statement(conn, cursor, query, params)
+            
+            if fetchone:
+                result = cursor.fetchone()
+            elif fetchall:
+                result = cursor.fetchall()
+            
+            if commit:
+                conn.commit()
+                
+            return result
+        except Exception as e:
+            conn.rollback()
+            # The server no longer knows our statements, e.g. after a pooler switched backends
+            if getattr(e, 'pgcode', None) == '26000' and getattr(conn, 'prepared', None):
+                conn.prepared.clear()
+            raise
+        finally:
+            if cursor:
+                cursor.close()
+            release_connection(conn)
+    
+    def execute_many(self, query, rows, commit=True):
+        """Execute a query once per parameter tuple, sending them to the server in pages"""
+        conn = get_connection()
+        
+        try:
+            with conn.cursor() as cursor:
+                psycopg2.extras.execute_batch(cursor, query, rows)
+            if commit:
+                conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            release_connection(conn)
+    
+    @contextmanager
+    def transaction(self):
+        """Run several statements on one pooled connection, committed if the block doesn't raise
+        
+        Yields:
+            cursor: Cursor taking the usual %s placeholders
+        """
+        conn = get_connection()
+        try:
+            with conn.cursor() as cursor:
+                yield cursor
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            release_connection(conn)
+    
+    def close(self):
+        if connection_pool:
+            connection_pool.closeall()
+
+STORAGE_BACKENDS = {
+    'postgres': PostgresStorage,
+    'sqlite': lambda: SQLiteStorage(DB_SQLITE_PATH, pool_size=DB_POOL_MAX)
+}
+
+# Storage every execute_query call goes through
+storage = STORAGE_BACKENDS[DB_BACKEND]()
+
+class ChangeListener:
+    """Background thread that LISTENs for change notifications and dispatches them
+    
+    Handlers are registered per table with on_change and are called with the
+    decoded notification payload. Notifications sent while the listener was
+    disconnected are lost, so after every (re)connect each handler is called
+    with None and should drop everything it has cached.
+    
+    Args:
+        channel (str): Notification channel to listen on
+        poll_interval (float): Seconds between checks for a stop request
+    """
+    
+    def __init__(self, channel=DB_NOTIFY_CHANNEL, poll_interval=5):
+        self.channel = channel
+        self.poll_interval = poll_interval
+        self._handlers = {}  # table -> [handler]
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self.connected = False
+        self.received = 0
+    
+    def on_change(self, table, handler):
+        """Call handler(payload) for every change notification about table"""
+        with self._lock:
+            self._handlers.setdefault(table, []).append(handler)
+    
+    def dispatch(self, table, payload):
+        """Call the handlers registered for table, logging rather than raising their errors"""
+        with self._lock:
+            handlers = list(self._handlers.get(table, ()))
+        
+        for handler in handlers:
+            try:
+                handler(payload)
+            except Exception as e:
+                logger.error(f"Change handler for {table} failed: {str(e)}")
+    
+    def reset(self):
+        """Tell every handler that notifications may have been missed"""
+        with self._lock:
+            tables = list(self._handlers)
+        
+        for table in tables:
+            self.dispatch(table, None)
+    
+    @property
+    def running(self):
+        """Whether the listener thread has been started"""
+        return self._thread is not None
+    
+    def start(self):
+        """Start the listener thread"""
+        if self._thread:
+            return
+        
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='change-listener', daemon=True)
+        self._thread.start()
+        logger.info(f"Listening for change notifications on {self.channel}")
+    
+    def stop(self):
+        """Stop the listener thread"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+    
+    def _run(self):
+        delay = 1
+        while not self._stop.is_set():
+            conn = None
+            try:
+                # Its own connection, outside the pool: LISTEN lasts for the whole session.
+                # Keepalives make a silently dropped connection fail instead of hanging.
+                conn = psycopg2.connect(host=DB_HOST, port=DB_PORT, database=DB_NAME, user=DB_USER,
+                                        password=DB_PASSWORD, keepalives=1, keepalives_idle=30,
+                                        keepalives_interval=10, keepalives_count=3)
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute(f"LISTEN {self.channel}")
+                
+                self.connected = True
+                delay = 1
+                self.reset()
+                self._listen(conn)
+            except Exception as e:
+                logger.error(f"Change listener connection failed, retrying in {delay}s: {str(e)}")
+            finally:
+                self.connected = False
+                if conn:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+            
+            if self._stop.wait(delay):
+                break
+            delay = min(delay * 2, DB_NOTIFY_RECONNECT_MAX)
+    
+    def _listen(self, conn):
+        while not self._stop.is_set():
+            if not select.select([conn], [], [], self.poll_interval)[0]:
+                continue
+            
+            conn.poll()
+            while conn.notifies:
+                notification = conn.notifies.pop(0)
+                self.received += 1
+                try:
+                    payload = json.loads(notification.payload)
+                except ValueError:
+                    logger.warning(f"Ignoring malformed change notification: {notification.payload[:100]}")
+                    continue
+                self.dispatch(payload.get('table'), payload)
+
+# Shared listener; caches register their handlers at import time
+change_listener = ChangeListener()
+
+def init_db(migrate=DB_AUTO_MIGRATE):
+    """Initialize the database connection pool
+    
+    With DB_BACKEND=sqlite the database file is opened and its schema created
+    instead; migrations and partitioning only apply to Postgres.
+    
+    Args:
+        migrate (bool, optional): Apply pending schema migrations after creating tables
+    """
+    if storage.name == 'sqlite':
+        try:
+            storage.connect()
+            return True
+        except Exception as e:
+            logger.error(f"Failed to open SQLite database: {str(e)}")
+            return False
+    
+    try:
+        storage.connect()
         
         # Create tables if they don't exist
         create_tables()
         
+        if migrate:
+            apply_migrations()
+        
+        # Make sure new tokens always have a partition to go to
+        create_token_partitions()
+        
         return True
     except Exception as e:
         logger.error(f"Failed to connect to database: {str(e)}")
         return False
 
 def get_connection():
-    """Get a connection from the pool"""
+    """Get a connection from the pool, waiting up to DB_POOL_TIMEOUT seconds for one to be free"""
     if connection_pool:
         return connection_pool.getconn()
     else:
@@ -60,80 +364,490 @@ def release_connection(conn):
     if connection_pool:
         connection_pool.putconn(conn)
 
-def execute_query(query, params=None, fetchone=False, fetchall=False, commit=False):
-    """Execute a database query with optional parameters"""
-    conn = None
-    cursor = None
-    result = None
+def get_pool_stats():
+    """Get connection pool usage and checkout wait-time statistics"""
+    if connection_pool:
+        return connection_pool.stats()
+    return None
+
+def collect_pool_metrics():
+    """Render connection pool gauges and the checkout wait histogram for /metrics"""
+    stats = get_pool_stats()
+    if not stats:
+        return []
+    
+    return [
+        "# HELP db_pool_connections Open pooled connections by state",
+        "# TYPE db_pool_connections gauge",
+        metrics.format_sample('db_pool_connections', {'state': 'in_use'}, stats['in_use']),
+        metrics.format_sample('db_pool_connections', {'state': 'idle'}, stats['idle']),
+        "# HELP db_pool_max_connections Maximum pool size",
+        "# TYPE db_pool_max_connections gauge",
+        metrics.format_sample('db_pool_max_connections', {}, stats['max']),
+        "# HELP db_pool_checkout_failures_total Checkouts that timed out or failed to connect",
+        "# TYPE db_pool_checkout_failures_total counter",
+        metrics.format_sample('db_pool_checkout_failures_total', {}, stats['checkout_failures']),
+        "# HELP db_pool_checkout_wait_seconds Time spent waiting for a pooled connection",
+        "# TYPE db_pool_checkout_wait_seconds histogram",
+        *metrics.format_histogram('db_pool_checkout_wait_seconds', {}, stats['wait_time_buckets'], stats['wait_time_sum'])
+    ]
+
+metrics.Collector(collect_pool_metrics)
+
+def collect_listener_metrics():
+    """Render change listener state for /metrics"""
+    if not change_listener.running:
+        return []
     
+    return [
+        "# HELP db_change_listener_connected Whether the change notification listener is connected",
+        "# TYPE db_change_listener_connected gauge",
+        metrics.format_sample('db_change_listener_connected', {}, int(change_listener.connected)),
+        "# HELP db_change_notifications_total Change notifications received",
+        "# TYPE db_change_notifications_total counter",
+        metrics.format_sample('db_change_notifications_total', {}, change_listener.received)
+    ]
+
+metrics.Collector(collect_listener_metrics)
+
+@lru_cache(maxsize=1024)
+def statement_label(query):
+    """Get a short, stable label identifying a query in metrics
+    
+    Based on the query's normalized form, so statements built by formatting
+    (e.g. the per-day partition DDL) share one label instead of adding a new
+    series for every day.
+    """
+    return query_fingerprint(query)[1][:120]
+
+@lru_cache(maxsize=1024)
+def get_prepared_form(query):
+    """Translate a %s-style query into a named server-side prepared statement
+    
+    Returns:
+        tuple: (name, statement, parameter count), or None if the query can't be prepared
+    """
+    statement = query.strip()
+    if not statement.upper().startswith(PREPARABLE_COMMANDS) or '%(' in statement or '%%' in statement:
+        return None
+    
+    parts = statement.split('%s')
+    statement = parts[0] + ''.join(f"${index}{part}" for index, part in enumerate(parts[1:], start=1))
+    name = 'stmt_' + hashlib.sha1(query.encode('utf-8')).hexdigest()[:16]
+    
+    return name, statement, len(parts) - 1
+
+@lru_cache(maxsize=1024)
+def query_fingerprint(query):
+    """Normalize a query so every call of the same statement shares one fingerprint
+    
+    Literals become ?, and so do numbered identifier suffixes such as the
+    date in tokens_p20261017.
+    
+    Returns:
+        tuple: (short hash, normalized query with literals replaced by ?)
+    """
+    normalized = ' '.join(query.split())
+    normalized = re.sub(r"'(?:[^']|'')*'", '?', normalized)
+    normalized = re.sub(r"\b\d+(?:\.\d+)?\b", '?', normalized)
+    normalized = re.sub(r"\b([A-Za-z_]\w*?_[A-Za-z]*)\d{4,}\b", r'\1?', normalized)
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:12], normalized
+
+def param_shape(params):
+    """Describe query parameters by type and size without revealing their values"""
+    if params is None:
+        return '()'
+    
+    shapes = []
+    for value in params:
+        if isinstance(value, (str, bytes, bytearray, list, tuple)):
+            shapes.append(f"{type(value).__name__}[{len(value)}]")
+        else:
+            shapes.append(type(value).__name__)
+    return f"({', '.join(shapes)})"
+
+def get_plan_logger():
+    """Get the logger writing EXPLAIN output to DB_SLOW_QUERY_EXPLAIN_FILE"""
+    global plan_logger
+    
+    if plan_logger is None:
+        Path(DB_SLOW_QUERY_EXPLAIN_FILE).parent.mkdir(parents=True, exist_ok=True)
+        handler = logging.handlers.RotatingFileHandler(
+            DB_SLOW_QUERY_EXPLAIN_FILE, maxBytes=10 * 1024 * 1024, backupCount=5
+        )
+        handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        plan_logger = logging.getLogger('db.plans')
+        plan_logger.propagate = False
+        plan_logger.setLevel(logging.INFO)
+        plan_logger.addHandler(handler)
+    return plan_logger
+
+def log_slow_query(query, params, elapsed_ms):
+    """Log a statement that exceeded DB_SLOW_QUERY_MS and maybe capture its plan"""
+    fingerprint, normalized = query_fingerprint(query)
+    logger.warning("Slow query (%.1f ms) [%s] %s params=%s",
+                   elapsed_ms, fingerprint, normalized, param_shape(params))
+    
+    # EXPLAIN ANALYZE executes the statement, so only read-only queries are captured
+    if (DB_SLOW_QUERY_EXPLAIN_SAMPLE and storage.name == 'postgres' and normalized.upper().startswith('SELECT')
+            and random.random() < DB_SLOW_QUERY_EXPLAIN_SAMPLE):
+        if not explain_slots.acquire(blocking=False):
+            return
+        future = explain_executor.submit(capture_plan, query, params, fingerprint, elapsed_ms)
+        future.add_done_callback(lambda _: explain_slots.release())
+
+def capture_plan(query, params, fingerprint, elapsed_ms):
+    """Run EXPLAIN (ANALYZE, BUFFERS) for a slow query and write the plan to the plan log"""
+    conn = None
     try:
         conn = get_connection()
-        cursor = conn.cursor()
+        with conn.cursor() as cursor:
+            cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS) {query}", params)
+            plan = '\n'.join(row[0] for row in cursor.fetchall())
+        conn.rollback()
         
+        get_plan_logger().info(f"[{fingerprint}] {elapsed_ms:.1f} ms\n{query_fingerprint(query)[1]}\n{plan}\n")
+    except Exception as e:
+        logger.error(f"Failed to capture query plan [{fingerprint}]: {str(e)}")
+        if conn:
+            conn.rollback()
+    finally:
+        if conn:
+            release_connection(conn)
+
+def execute_statement(conn, cursor, query, params=None):
+    """Execute a query, through a prepared statement on this connection when possible"""
+    prepared = get_prepared_form(query) if DB_PREPARE_STATEMENTS else None
+    statements = getattr(conn, 'prepared', None)
+    
+    if prepared is None or statements is None or prepared[2] != len(params or ()):
         if params:
             cursor.execute(query, params)
         else:
             cursor.execute(query)
+        return
+    
+    name, statement, param_count = prepared
+    
+    if name in statements:
+        statements.move_to_end(name)
+    else:
+        cursor.execute(f"PREPARE {name} AS {statement}")
+        statements[name] = query
         
-        if fetchone:
-            result = cursor.fetchone()
-        elif fetchall:
-            result = cursor.fetchall()
-        
-        if commit:
-            conn.commit()
-            
-        return result
+        # Keep the number of prepared statements per connection bounded
+        while len(statements) > DB_PREPARED_STATEMENTS_MAX:
+            evicted, _ = statements.popitem(last=False)
+            cursor.execute(f"DEALLOCATE {evicted}")
+    
+    if param_count:
+        cursor.execute(f"EXECUTE {name} ({', '.join(['%s'] * param_count)})", params)
+    else:
+        cursor.execute(f"EXECUTE {name}")
+
+def execute_query(query, params=None, fetchone=False, fetchall=False, commit=False):
+    """Execute a database query with optional parameters
+    
+    Queries are written for Postgres and run on the configured storage
+    backend. On Postgres, statements are prepared once per pooled connection
+    and reused, unless DB_PREPARE_STATEMENTS is disabled.
+    """
+    started = time.perf_counter()
+    
+    try:
+        return storage.execute(query, params, fetchone=fetchone, fetchall=fetchall, commit=commit)
     except Exception as e:
-        if conn:
-            conn.rollback()
         logger.error(f"Database error: {str(e)}")
         logger.error(f"Query: {query}")
         logger.error(f"Params: {params}")
         raise
     finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            release_connection(conn)
+        elapsed = time.perf_counter() - started
+        metrics.QUERY_DURATION.observe(elapsed, statement=statement_label(query))
+        if DB_SLOW_QUERY_MS and elapsed * 1000 >= DB_SLOW_QUERY_MS:
+            log_slow_query(query, params, elapsed * 1000)
+
+def transaction():
+    """Run several queries in one transaction on the configured storage backend
+    
+    For read-modify-write updates that must not interleave across workers:
+    lock rows with SELECT ... FOR UPDATE (on SQLite the whole write lock is
+    taken when the transaction starts).
+    
+    Usage:
+        with db.transaction() as cursor:
+            cursor.execute(query, params)
+    """
+    return storage.transaction()
+
+def execute_many(query, rows, commit=True):
+    """Execute a query once for each parameter tuple in rows, in one transaction"""
+    try:
+        storage.execute_many(query, rows, commit=commit)
+    except Exception as e:
+        logger.error(f"Database error: {str(e)}")
+        logger.error(f"Query: {query}")
+        raise
 
 def create_tables():
-    """Create database tables if they don't exist"""
-    # Users table
-    execute_query("""
-    CREATE TABLE IF NOT EXISTS users (
-        id SERIAL PRIMARY KEY,
-        username VARCHAR(50) NOT NULL,
-        email VARCHAR(100) UNIQUE NOT NULL,
-        password_hash VARCHAR(255) NOT NULL,
-        created_at TIMESTAMP DEFAULT NOW(),
-        last_login TIMESTAMP NULL
-    )
-    """, commit=True)
-    
-    # Tokens table
-    execute_query("""
-    CREATE TABLE IF NOT EXISTS tokens (
-        id SERIAL PRIMARY KEY,
-        user_id INTEGER NOT NULL REFERENCES users(id),
-        token_value VARCHAR(500) NOT NULL,
-        created_at TIMESTAMP DEFAULT NOW(),
-        expires_at TIMESTAMP NOT NULL,
-        issued_for VARCHAR(255) NULL
-    )
-    """, commit=True)
-    
-    # Registered services table
-    execute_query("""
-    CREATE TABLE IF NOT EXISTS registered_services (
-        id SERIAL PRIMARY KEY,
-        name VARCHAR(100) NOT NULL,
-        domain VARCHAR(255) UNIQUE NOT NULL,
-        client_id VARCHAR(36) UNIQUE NOT NULL,
-        client_secret VARCHAR(64) NULL,
-        created_at TIMESTAMP DEFAULT NOW(),
-        is_active BOOLEAN DEFAULT TRUE
-    )
-    """, commit=True)
+    """Create database tables if they don't exist
+    
+    Only tables whose schema hasn't changed since: tokens is created and
+    brought up to date by the migrations (0000_tokens.sql onwards).
+    """
+    with migration_lock() as (conn, cursor):
+        # Users table
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id SERIAL PRIMARY KEY,
+            username VARCHAR(50) NOT NULL,
+            email VARCHAR(100) UNIQUE NOT NULL,
+            password_hash VARCHAR(255) NOT NULL,
+            created_at TIMESTAMP DEFAULT NOW(),
+            last_login TIMESTAMP NULL
+        )
+        """)
+        
+        # Registered services table
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS registered_services (
+            id SERIAL PRIMARY KEY,
+            name VARCHAR(100) NOT NULL,
+            domain VARCHAR(255) UNIQUE NOT NULL,
+            client_id VARCHAR(36) UNIQUE NOT NULL,
+            client_secret VARCHAR(64) NULL,
+            created_at TIMESTAMP DEFAULT NOW(),
+            is_active BOOLEAN DEFAULT TRUE
+        )
+        """)
+        
+        conn.commit()
     
     logger.info("Database tables created if they didn't exist")
+
+@contextmanager
+def migration_lock():
+    """Hold the migration advisory lock on a pooled connection
+    
+    Serializes schema changes across workers starting at the same time:
+    even CREATE TABLE IF NOT EXISTS fails when two run concurrently.
+    
+    Yields:
+        tuple: (connection, cursor) holding the lock
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_ID,))
+        conn.commit()
+        yield conn, cursor
+    finally:
+        try:
+            conn.rollback()
+            cursor.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_ID,))
+            conn.commit()
+        except Exception as e:
+            logger.warning(f"Failed to release migration lock: {str(e)}")
+        cursor.close()
+        release_connection(conn)
+
+def list_migrations():
+    """List migration files ordered by version
+    
+    Migration files live in backend/migrations and are named
+    <version>_<description>.sql, e.g. 0001_tokens_indexes.sql.
+    
+    Returns:
+        list: (version, name, path) tuples sorted by version
+    """
+    migrations = []
+    for path in MIGRATIONS_DIR.glob('*.sql'):
+        version, _, name = path.stem.partition('_')
+        if not version.isdigit():
+            logger.warning(f"Skipping migration file with invalid name: {path.name}")
+            continue
+        migrations.append((int(version), name, path))
+    
+    return sorted(migrations)
+
+# Created by apply_migrations with the migration lock held
+SCHEMA_VERSION_TABLE = """
+CREATE TABLE IF NOT EXISTS schema_version (
+    version INTEGER PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    applied_at TIMESTAMP DEFAULT NOW()
+)
+"""
+
+def get_applied_migrations():
+    """Get the set of migration versions already applied, empty if none ever were"""
+    if not execute_query("SELECT to_regclass('schema_version') IS NOT NULL", fetchone=True)[0]:
+        return set()
+    
+    rows = execute_query("SELECT version FROM schema_version", fetchall=True)
+    return {row[0] for row in rows}
+
+def apply_migrations():
+    """Apply all pending migrations in version order
+    
+    Each migration runs in its own transaction together with its
+    schema_version row, so a failed migration leaves no partial changes.
+    
+    Returns:
+        list: Versions of the migrations that were applied
+    """
+    if storage.name != 'postgres':
+        logger.info(f"Migrations don't apply to the {storage.name} backend, its schema is created by init_db")
+        return []
+    
+    applied_now = []
+    
+    with migration_lock() as (conn, cursor):
+        # Created with the lock held, like every other schema change
+        cursor.execute(SCHEMA_VERSION_TABLE)
+        cursor.execute("SELECT version FROM schema_version")
+        applied = {row[0] for row in cursor.fetchall()}
+        conn.commit()
+        
+        for version, name, path in list_migrations():
+            if version in applied:
+                continue
+            
+            logger.info(f"Applying migration {version:04d}_{name}")
+            try:
+                cursor.execute(path.read_text())
+                cursor.execute(
+                    "INSERT INTO schema_version (version, name) VALUES (%s, %s)",
+                    (version, name)
+                )
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                logger.error(f"Migration {version:04d}_{name} failed: {str(e)}")
+                raise
+            
+            applied_now.append(version)
+    
+    if applied_now:
+        logger.info(f"Applied {len(applied_now)} migration(s), schema is at version {applied_now[-1]}")
+    return applied_now
+
+def migration_status():
+    """Get the applied/pending state of every known migration
+    
+    Returns:
+        list: Dicts with version, name and applied flag, ordered by version
+    """
+    if storage.name != 'postgres':
+        return []
+    
+    applied = get_applied_migrations()
+    return [
+        {'version': version, 'name': name, 'applied': version in applied}
+        for version, name, _ in list_migrations()
+    ]
+
+def tokens_partitioned():
+    """Check whether the tokens table has been converted to a partitioned table"""
+    if storage.name != 'postgres':
+        return False
+    
+    row = execute_query("SELECT relkind FROM pg_class WHERE relname = 'tokens' AND relkind = 'p'", fetchone=True)
+    return row is not None
+
+def list_token_partitions():
+    """List the tokens table's daily partitions
+    
+    Returns:
+        list: (day, partition name) tuples sorted by day
+    """
+    query = """
+    SELECT child.relname
+    FROM pg_inherits
+    JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+    JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+    WHERE parent.relname = 'tokens'
+    """
+    partitions = []
+    for (name,) in execute_query(query, fetchall=True):
+        try:
+            day = datetime.datetime.strptime(name, 'tokens_p%Y%m%d').date()
+        except ValueError:
+            continue
+        partitions.append((day, name))
+    
+    return sorted(partitions)
+
+def is_missing_partition_error(error):
+    """Check whether an INSERT failed because no tokens partition covers the row"""
+    return getattr(error, 'pgcode', None) == '23514' and 'no partition of relation' in str(error)
+
+def create_token_partitions(days_ahead=TOKEN_PARTITION_DAYS_AHEAD):
+    """Create the tokens partitions for yesterday through days_ahead days from now
+    
+    Returns:
+        list: Names of the partitions created
+    """
+    if not tokens_partitioned():
+        return []
+    
+    existing = {name for _, name in list_token_partitions()}
+    today = datetime.datetime.utcnow().date()
+    created = []
+    
+    for offset in range(-1, days_ahead + 1):
+        day = today + datetime.timedelta(days=offset)
+        name = f"tokens_p{day:%Y%m%d}"
+        if name in existing:
+            continue
+        
+        execute_query(f"""
+        CREATE TABLE IF NOT EXISTS {name} PARTITION OF tokens
+        FOR VALUES FROM ('{day}') TO ('{day + datetime.timedelta(days=1)}')
+        """, commit=True)
+        created.append(name)
+    
+    if created:
+        logger.info(f"Created tokens partitions: {', '.join(created)}")
+    return created
+
+def drop_expired_token_partitions(retain_days=TOKEN_PARTITION_RETAIN_DAYS):
+    """Drop tokens partitions whose tokens all expired more than retain_days ago
+    
+    Dropping a partition removes its rows and index entries in constant time,
+    without the dead tuples and vacuum work of a DELETE.
+    
+    Returns:
+        list: Names of the partitions dropped
+    """
+    if not tokens_partitioned():
+        return []
+    
+    cutoff = datetime.datetime.utcnow().date() - datetime.timedelta(days=retain_days)
+    dropped = []
+    
+    for day, name in list_token_partitions():
+        # The partition holds tokens expiring before day + 1
+        if day + datetime.timedelta(days=1) > cutoff:
+            break
+        
+        execute_query(f"DROP TABLE IF EXISTS {name}", commit=True)
+        dropped.append(name)
+    
+    if dropped:
+        logger.info(f"Dropped expired tokens partitions: {', '.join(dropped)}")
+    return dropped
+
+def delete_expired_tokens(retain_days=TOKEN_PARTITION_RETAIN_DAYS):
+    """Delete tokens that expired more than retain_days ago, for unpartitioned tokens tables
+    
+    Returns:
+        int: Number of tokens deleted
+    """
+    cutoff = datetime.datetime.utcnow() - datetime.timedelta(days=retain_days)
+    rows = execute_query("DELETE FROM tokens WHERE expires_at < %s RETURNING id", (cutoff,), fetchall=True, commit=True)
+    
+    if rows:
+        logger.info(f"Deleted {len(rows)} expired token(s)")
+    return len(rows)
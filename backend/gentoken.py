@@ -1,8 +1,12 @@
 import os
+import uuid
+import time
+import hashlib
 import datetime
 import logging
-import jwt
-from . import db
+import threading
+from . import db, metrics
+from .keys import keyring
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -14,61 +18,195 @@ project_root = Path(__file__).parent.parent
 env_path = project_root / '.env'
 load_dotenv(dotenv_path=env_path)
 
-# Get secret key
-SECRET_KEY = os.environ.get('SECRET_KEY', 'dev_secret_key')
+# Group commit: concurrent token inserts are written as one multi-row INSERT
+# and one commit, collecting up to MAX_BATCH rows for at most MAX_WAIT_MS
+TOKEN_GROUP_COMMIT = os.environ.get('TOKEN_GROUP_COMMIT', 'False').lower() == 'true'
+TOKEN_GROUP_COMMIT_MAX_BATCH = int(os.environ.get('TOKEN_GROUP_COMMIT_MAX_BATCH', '64'))
+TOKEN_GROUP_COMMIT_MAX_WAIT_MS = float(os.environ.get('TOKEN_GROUP_COMMIT_MAX_WAIT_MS', '5'))
 
-def generate_token(user_id, service=None):
+def generate_token(user_id, service=None, user=None):
     """Generate a JWT token for the user
     
     Args:
         user_id (int): User ID for which to generate token
         service (str, optional): Service domain for which token is issued
-        
+        user (dict, optional): User data; its username and email are embedded as
+            claims so stateless verification doesn't need a user lookup
+    
     Returns:
-        str: JWT token
+        str: JWT token, or None if it couldn't be stored (it would never verify)
     """
     expiration = datetime.datetime.utcnow() + datetime.timedelta(hours=24)
     
+    jti = str(uuid.uuid4())
+    
     payload = {
         'sub': str(user_id),  # Convert to string here
         'iat': datetime.datetime.utcnow(),
         'exp': expiration,
+        'jti': jti,
     }
     
+    if user:
+        payload['username'] = user['username']
+        payload['email'] = user['email']
+    
     if service:
         payload['aud'] = service
     
     # Create JWT token using PyJWT
-    token = jwt.encode(payload, SECRET_KEY, algorithm="HS256")
+    started = time.perf_counter()
+    token = keyring.sign(payload)
+    metrics.JWT_DURATION.observe(time.perf_counter() - started, operation='encode')
     
     # If token is bytes, convert to string
     if isinstance(token, bytes):
         token = token.decode('utf-8')
     
     # Store token in database
-    store_token(user_id, token, expiration, service)
+    if store_token(user_id, token, expiration, service, jti) is None:
+        return None
     
-    logger.info(f"Token generated for user {user_id}" + (f" for service {service}" if service else ""))
+    if service:
+        logger.info("Token generated for user %s for service %s", user_id, service,
+                    extra={'event': 'token_generated'})
+    else:
+        logger.info("Token generated for user %s", user_id, extra={'event': 'token_generated'})
     return token
 
-def store_token(user_id, token_value, expires_at, issued_for=None):
-    """Store token in the database"""
+def token_digest(token_value):
+    """Get the SHA-256 digest under which a token is stored"""
+    return hashlib.sha256(token_value.encode('utf-8')).digest()
+
+def store_token(user_id, token_value, expires_at, issued_for=None, jti=None):
+    """Store token in the database
+    
+    Only the token's digest is stored; the JWT itself never reaches the database.
+    With TOKEN_GROUP_COMMIT enabled the row is handed to token_committer and
+    this call returns once the batch containing it has been committed.
+    """
+    # Group commit saves Postgres round trips; SQLite writes are already in-process
+    if TOKEN_GROUP_COMMIT and jti and db.storage.name == 'postgres':
+        try:
+            return token_committer.submit((user_id, token_digest(token_value), expires_at, issued_for, jti))
+        except Exception as e:
+            logger.error(f"Failed to store token: {str(e)}")
+            return None
+    
     query = """
-    INSERT INTO tokens (user_id, token_value, expires_at, issued_for)
-    VALUES (%s, %s, %s, %s)
+    INSERT INTO tokens (user_id, token_digest, expires_at, issued_for, jti)
+    VALUES (%s, %s, %s, %s, %s)
     RETURNING id
     """
     try:
-        row = db.execute_query(
-            query,
-            (user_id, token_value, expires_at, issued_for),
-            fetchone=True,
-            commit=True
-        )
+        rows = insert_tokens(query, (user_id, token_digest(token_value), expires_at, issued_for, jti))
         
-        if row:
-            return row[0]  # Return the new token ID
+        if rows:
+            return rows[0][0]  # Return the new token ID
     except Exception as e:
         logger.error(f"Failed to store token: {str(e)}")
     
     return None
+
+def insert_tokens(query, params):
+    """Run a tokens INSERT ... RETURNING, creating missing partitions and retrying once
+    
+    Partitions are normally created ahead of time by init_db and
+    `manage.py maintain-tokens`; this keeps tokens insertable if that stopped running.
+    """
+    try:
+        return db.execute_query(query, params, fetchall=True, commit=True)
+    except Exception as e:
+        if not db.is_missing_partition_error(e):
+            raise
+    
+    logger.warning("No tokens partition for a new token, creating partitions (is maintain-tokens scheduled?)")
+    try:
+        db.create_token_partitions()
+    except Exception as e:
+        # Another worker may have created the same partition first
+        logger.warning(f"Failed to create tokens partitions: {str(e)}")
+    
+    return db.execute_query(query, params, fetchall=True, commit=True)
+
+
+class TokenGroupCommitter:
+    """Collects concurrent token inserts and commits them together
+    
+    A single writer thread takes up to max_batch queued rows, waiting at most
+    max_wait seconds after the first one arrives, inserts them with one
+    statement and commits once. Each caller is released when its row is durable.
+    """
+    
+    def __init__(self, max_batch=TOKEN_GROUP_COMMIT_MAX_BATCH, max_wait=TOKEN_GROUP_COMMIT_MAX_WAIT_MS / 1000):
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = []
+        self._cond = threading.Condition()
+        self._thread = None
+    
+    def submit(self, row):
+        """Queue a (user_id, token_digest, expires_at, issued_for, jti) row and wait for it to commit
+        
+        Returns:
+            int: The new token ID
+        """
+        entry = {'row': row, 'done': threading.Event(), 'id': None, 'error': None}
+        
+        with self._cond:
+            self._queue.append(entry)
+            
+            # Started lazily so forked workers each get their own thread
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='token-group-commit', daemon=True)
+                self._thread.start()
+            
+            self._cond.notify()
+        
+        entry['done'].wait()
+        if entry['error']:
+            raise entry['error']
+        return entry['id']
+    
+    def _take_batch(self):
+        with self._cond:
+            while not self._queue:
+                self._cond.wait()
+            
+            # Give concurrent callers a short window to join the batch
+            deadline = time.monotonic() + self.max_wait
+            while len(self._queue) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            
+            batch, self._queue = self._queue[:self.max_batch], self._queue[self.max_batch:]
+            return batch
+    
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            
+            # unnest keeps the statement text constant regardless of batch size
+            query = """
+            INSERT INTO tokens (user_id, token_digest, expires_at, issued_for, jti)
+            SELECT * FROM unnest(%s::integer[], %s::bytea[], %s::timestamp[], %s::varchar[], %s::varchar[])
+            RETURNING id, jti
+            """
+            columns = [list(column) for column in zip(*(entry['row'] for entry in batch))]
+            
+            try:
+                rows = insert_tokens(query, columns)
+                ids = dict((jti, token_id) for token_id, jti in rows)
+                for entry in batch:
+                    entry['id'] = ids.get(entry['row'][4])
+            except Exception as e:
+                for entry in batch:
+                    entry['error'] = e
+            
+            for entry in batch:
+                entry['done'].set()
+
+# Shared committer used by store_token when TOKEN_GROUP_COMMIT is enabled
+token_committer = TokenGroupCommitter()
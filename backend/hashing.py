@@ -0,0 +1,78 @@
+import os
+import time
+import logging
+import threading
+import bcrypt
+from concurrent.futures import ThreadPoolExecutor
+from . import metrics
+from pathlib import Path
+from dotenv import load_dotenv
+
+# Configure logging
+logger = logging.getLogger('hashing')
+
+# Load environment variables
+project_root = Path(__file__).parent.parent
+env_path = project_root / '.env'
+load_dotenv(dotenv_path=env_path)
+
+# bcrypt runs on a dedicated pool sized to the CPU count, so a login burst can
+# only ever occupy that many cores. Requests beyond the queue limit fail fast.
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', str(os.cpu_count() or 1)))
+PASSWORD_HASH_QUEUE_MAX = int(os.environ.get('PASSWORD_HASH_QUEUE_MAX', str(PASSWORD_HASH_WORKERS * 4)))
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', '12'))
+
+class HashingBusy(Exception):
+    """Raised when the password hashing queue is full"""
+
+# bcrypt releases the GIL while hashing, so worker threads run on separate cores
+executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix='bcrypt')
+slots = threading.BoundedSemaphore(PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE_MAX)
+
+def run_in_pool(func, *args):
+    """Run a bcrypt call on the hashing pool and wait for its result
+    
+    Raises:
+        HashingBusy: If PASSWORD_HASH_QUEUE_MAX calls are already waiting
+    """
+    if not slots.acquire(blocking=False):
+        logger.warning("Password hashing queue full, rejecting request")
+        metrics.PASSWORD_HASH_REJECTIONS.inc()
+        raise HashingBusy("Password hashing queue is full")
+    
+    try:
+        future = executor.submit(func, *args)
+    except Exception:
+        slots.release()
+        raise
+    
+    future.add_done_callback(lambda _: slots.release())
+    return future.result()
+
+def timed(operation, func, *args):
+    """Run a bcrypt call and record how long it took on the worker"""
+    started = time.perf_counter()
+    try:
+        return func(*args)
+    finally:
+        metrics.PASSWORD_HASH_DURATION.observe(time.perf_counter() - started, operation=operation)
+
+def hash_password(password):
+    """Hash a password with a fresh bcrypt salt
+    
+    Returns:
+        str: bcrypt hash
+    """
+    password_bytes = password.encode('utf-8') if isinstance(password, str) else password
+    salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
+    return run_in_pool(timed, 'hash', bcrypt.hashpw, password_bytes, salt).decode('utf-8')
+
+def check_password(password, password_hash):
+    """Check a password against a stored bcrypt hash
+    
+    Returns:
+        bool: True if the password matches
+    """
+    password_bytes = password.encode('utf-8') if isinstance(password, str) else password
+    hash_bytes = password_hash.encode('utf-8') if isinstance(password_hash, str) else password_hash
+    return run_in_pool(timed, 'check', bcrypt.checkpw, password_bytes, hash_bytes)
@@ -0,0 +1,234 @@
+import io
+import re
+import csv
+import json
+import time
+import logging
+import bcrypt
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from . import db
+from .hashing import BCRYPT_ROUNDS, PASSWORD_HASH_WORKERS
+
+# Configure logging
+logger = logging.getLogger('importusers')
+
+# Rows are validated, hashed and loaded this many at a time
+IMPORT_BATCH_SIZE = 10000
+
+# A bcrypt hash in modular crypt format, as stored in users.password_hash
+BCRYPT_HASH_PATTERN = re.compile(r'^\$2[aby]\$\d{2}\$[./A-Za-z0-9]{53}$')
+
+def read_rows(path, file_format=None):
+    """Stream user records from a CSV file (with a header row) or an NDJSON file
+    
+    Args:
+        path (Path): File to read
+        file_format (str, optional): 'csv' or 'ndjson'; guessed from the suffix if omitted
+    
+    Yields:
+        tuple: (line number, record dict); records that can't be parsed are None
+    """
+    path = Path(path)
+    file_format = file_format or ('csv' if path.suffix.lower() == '.csv' else 'ndjson')
+    
+    with open(path, newline='', encoding='utf-8') as source:
+        if file_format == 'csv':
+            reader = csv.DictReader(source)
+            for record in reader:
+                yield reader.line_num, record
+            return
+        
+        for line_number, line in enumerate(source, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            yield line_number, record if isinstance(record, dict) else None
+
+def validate(record):
+    """Check a record and normalize it for loading
+    
+    A record needs an email and either a plaintext password or a bcrypt
+    password_hash. A missing username defaults to the email's local part.
+    
+    Returns:
+        tuple: ((username, email, password, password_hash), None) or (None, rejection reason)
+    """
+    if record is None:
+        return None, 'Malformed row'
+    
+    email = str(record.get('email') or '').strip()
+    username = str(record.get('username') or email.split('@')[0]).strip()
+    password = str(record.get('password') or '') or None
+    password_hash = str(record.get('password_hash') or '') or None
+    
+    if '@' not in email or len(email) > 100:
+        return None, 'Invalid email'
+    if not username or len(username) > 50:
+        return None, 'Invalid username'
+    if password_hash:
+        if not BCRYPT_HASH_PATTERN.match(password_hash):
+            return None, 'Invalid password_hash, expected a bcrypt hash'
+        password = None
+    elif not password:
+        return None, 'Missing password'
+    
+    return (username, email, password, password_hash), None
+
+def hash_plaintext(password):
+    """Hash one password in a worker process"""
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode('utf-8')
+
+def copy_users(rows):
+    """Load users through a COPY into a staging table, skipping emails that already exist
+    
+    Args:
+        rows (list): (username, email, password_hash) tuples with unique lowercase emails
+    
+    Returns:
+        set: Lowercase emails of the users inserted
+    """
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    
+    conn = db.get_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS import_users (
+                username VARCHAR(50),
+                email VARCHAR(100),
+                password_hash VARCHAR(255)
+            ) ON COMMIT DELETE ROWS
+            """)
+            cursor.copy_expert("COPY import_users (username, email, password_hash) FROM STDIN WITH (FORMAT csv)", buffer)
+            # Emails are unique regardless of case, like signup's LOWER(email) check
+            cursor.execute("""
+            INSERT INTO users (username, email, password_hash)
+            SELECT s.username, s.email, s.password_hash
+            FROM import_users s
+            WHERE NOT EXISTS (SELECT 1 FROM users u WHERE LOWER(u.email) = LOWER(s.email))
+            ON CONFLICT DO NOTHING
+            RETURNING LOWER(email)
+            """)
+            inserted = {row[0] for row in cursor.fetchall()}
+        conn.commit()
+        return inserted
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        db.release_connection(conn)
+
+def insert_users(rows):
+    """Load users with executemany, for the SQLite backend
+    
+    Args:
+        rows (list): (username, email, password_hash) tuples with unique lowercase emails
+    
+    Returns:
+        set: Lowercase emails of the users inserted
+    """
+    existing = db.execute_query(
+        "SELECT LOWER(email) FROM users WHERE LOWER(email) = ANY(%s)",
+        ([email.lower() for _, email, _ in rows],), fetchall=True
+    )
+    existing = {row[0] for row in existing}
+    
+    new_rows = [row for row in rows if row[1].lower() not in existing]
+    db.execute_many("INSERT INTO users (username, email, password_hash) VALUES (%s, %s, %s)", new_rows)
+    return {email.lower() for _, email, _ in new_rows}
+
+def load_batch(batch, executor, workers, reject):
+    """Hash the plaintext passwords in a batch and load it
+    
+    Args:
+        batch (list): (line number, username, email, password, password_hash) tuples
+        executor (ProcessPoolExecutor): Pool hashing plaintext passwords
+        workers (int): Processes in the pool
+        reject (callable): Called with (line number, email, reason) for each rejected row
+    
+    Returns:
+        int: Number of users inserted
+    """
+    plaintext = [password for _, _, _, password, _ in batch if password]
+    hashes = iter(executor.map(hash_plaintext, plaintext, chunksize=max(1, len(plaintext) // (workers * 4))))
+    
+    rows = [
+        (username, email, password_hash or next(hashes))
+        for _, username, email, password, password_hash in batch
+    ]
+    
+    if db.storage.name == 'postgres':
+        inserted = copy_users(rows)
+    else:
+        inserted = insert_users(rows)
+    
+    for line_number, _, email, _, _ in batch:
+        if email.lower() not in inserted:
+            reject(line_number, email, 'Email already exists')
+    return len(inserted)
+
+def import_users(path, report_path, file_format=None, batch_size=IMPORT_BATCH_SIZE, workers=PASSWORD_HASH_WORKERS):
+    """Import users from a CSV or NDJSON file
+    
+    Emails are deduplicated case-insensitively: the first occurrence in the
+    file wins, and emails that already have an account are skipped. Every
+    rejected row is written to report_path with its line number and reason,
+    never its password.
+    
+    Args:
+        path (Path): CSV or NDJSON file with email, username and password or password_hash fields
+        report_path (Path): CSV file listing rejected rows
+        file_format (str, optional): 'csv' or 'ndjson'; guessed from the suffix if omitted
+        batch_size (int): Rows validated, hashed and loaded together
+        workers (int): Processes hashing plaintext passwords
+    
+    Returns:
+        dict: Counts of rows read, imported and rejected
+    """
+    started = time.monotonic()
+    counts = {'read': 0, 'imported': 0, 'rejected': 0}
+    seen = set()
+    batch = []
+    
+    with open(report_path, 'w', newline='', encoding='utf-8') as report_file, \
+            ProcessPoolExecutor(max_workers=workers) as executor:
+        report = csv.writer(report_file)
+        report.writerow(['line', 'email', 'reason'])
+        
+        def reject(line_number, email, reason):
+            counts['rejected'] += 1
+            report.writerow([line_number, email, reason])
+        
+        def flush():
+            counts['imported'] += load_batch(batch, executor, workers, reject)
+            batch.clear()
+            logger.info("Imported %s of %s users read (%s rejected, %.0fs)",
+                        counts['imported'], counts['read'], counts['rejected'], time.monotonic() - started)
+        
+        for line_number, record in read_rows(path, file_format):
+            counts['read'] += 1
+            user, error = validate(record)
+            if error:
+                reject(line_number, record.get('email', '') if record else '', error)
+                continue
+            
+            username, email, password, password_hash = user
+            if email.lower() in seen:
+                reject(line_number, email, 'Duplicate email in input')
+                continue
+            seen.add(email.lower())
+            
+            batch.append((line_number, username, email, password, password_hash))
+            if len(batch) >= batch_size:
+                flush()
+        
+        if batch:
+            flush()
+    
+    return counts
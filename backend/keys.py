@@ -0,0 +1,189 @@
+import os
+import json
+import base64
+import hashlib
+import logging
+import tempfile
+import jwt
+from datetime import datetime, timezone
+from pathlib import Path
+from dotenv import load_dotenv
+
+# Configure logging
+logger = logging.getLogger('keys')
+
+# Load environment variables
+project_root = Path(__file__).parent.parent
+env_path = project_root / '.env'
+load_dotenv(dotenv_path=env_path)
+
+SECRET_KEY = os.environ.get('SECRET_KEY', 'dev_secret_key')
+
+# Token signing: HS256 with SECRET_KEY, or RS256/EdDSA with a private key whose
+# public half is published at /.well-known/jwks.json so services can verify
+# tokens locally. The key file is generated on first start if it doesn't exist.
+TOKEN_SIGNING_ALGORITHM = os.environ.get('TOKEN_SIGNING_ALGORITHM', 'HS256')
+TOKEN_SIGNING_KEY_FILE = project_root / os.environ.get('TOKEN_SIGNING_KEY_FILE', 'keys/signing_key.pem')
+# Public keys of retired signing keys (comma-separated PEM files), still published
+# and accepted until the tokens they signed have expired
+TOKEN_PREVIOUS_KEY_FILES = [
+    project_root / path.strip()
+    for path in os.environ.get('TOKEN_PREVIOUS_KEY_FILES', '').split(',') if path.strip()
+]
+JWKS_MAX_AGE = int(os.environ.get('JWKS_MAX_AGE', '3600'))
+
+def parse_cutoff(value):
+    """Parse an ISO 8601 date and time as naive UTC, converting values with an offset or Z
+    
+    Returns:
+        datetime: The cutoff, or None for an empty value
+    """
+    if not value:
+        return None
+    
+    # fromisoformat only accepts a Z suffix from Python 3.11
+    cutoff = datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+    if cutoff.tzinfo:
+        cutoff = cutoff.astimezone(timezone.utc).replace(tzinfo=None)
+    return cutoff
+
+# With an asymmetric algorithm, HS256 tokens (signed with SECRET_KEY before the
+# switch) are accepted until this UTC date and time, e.g. 2026-11-01T00:00
+# (values with an offset or Z are converted). Set it to the switch time plus the
+# token lifetime; empty rejects them.
+LEGACY_HS256_UNTIL = parse_cutoff(os.environ.get('LEGACY_HS256_UNTIL', ''))
+
+# Asymmetric algorithms need the cryptography package, imported only when used
+ASYMMETRIC_ALGORITHMS = ('RS256', 'EdDSA')
+
+if TOKEN_SIGNING_ALGORITHM not in ('HS256', *ASYMMETRIC_ALGORITHMS):
+    raise ValueError(f"Unsupported TOKEN_SIGNING_ALGORITHM: {TOKEN_SIGNING_ALGORITHM}")
+
+def generate_private_key(algorithm):
+    from cryptography.hazmat.primitives.asymmetric import rsa, ed25519
+    if algorithm == 'RS256':
+        return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    return ed25519.Ed25519PrivateKey.generate()
+
+def load_signing_key(path, algorithm):
+    """Load the PEM private signing key, generating and saving one if the file doesn't exist
+    
+    Every worker sharing the file ends up with the same key: the key is written
+    to a temporary file and linked into place only if no other worker got there
+    first, so the file is never seen half-written.
+    """
+    from cryptography.hazmat.primitives import serialization
+    
+    if not path.exists():
+        key = generate_private_key(algorithm)
+        pem = key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption()
+        )
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+        try:
+            with os.fdopen(fd, 'wb') as key_file:
+                key_file.write(pem)
+            os.link(temp_path, path)
+            logger.warning(f"Generated a new {algorithm} signing key at {path}")
+            return key
+        except FileExistsError:
+            pass
+        finally:
+            os.unlink(temp_path)
+    
+    return serialization.load_pem_private_key(path.read_bytes(), password=None)
+
+def load_public_key(path):
+    """Load a PEM public key, or the public half of a PEM private key"""
+    from cryptography.hazmat.primitives import serialization
+    
+    data = path.read_bytes()
+    if b'PRIVATE KEY' in data:
+        return serialization.load_pem_private_key(data, password=None).public_key()
+    return serialization.load_pem_public_key(data)
+
+def key_algorithm(public_key):
+    """Get the JWT algorithm for a public key"""
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    return 'RS256' if isinstance(public_key, rsa.RSAPublicKey) else 'EdDSA'
+
+def to_jwk(public_key):
+    """Get the JWK for a public key, with its RFC 7638 thumbprint as kid"""
+    from jwt.algorithms import RSAAlgorithm, OKPAlgorithm
+    
+    algorithm = key_algorithm(public_key)
+    jwk = json.loads((RSAAlgorithm if algorithm == 'RS256' else OKPAlgorithm).to_jwk(public_key))
+    
+    required = {name: jwk[name] for name in ('crv', 'e', 'kty', 'n', 'x') if name in jwk}
+    canonical = json.dumps(required, sort_keys=True, separators=(',', ':')).encode('utf-8')
+    kid = base64.urlsafe_b64encode(hashlib.sha256(canonical).digest()).rstrip(b'=').decode('ascii')
+    
+    return dict(jwk, kid=kid, use='sig', alg=algorithm)
+
+class KeyRing:
+    """Keys used to sign new tokens and verify issued ones
+    
+    Args:
+        algorithm (str): Signing algorithm, HS256, RS256 or EdDSA
+        signing_key_file (Path): PEM private key, for asymmetric algorithms
+        previous_key_files (list): PEM public keys that are still accepted
+    """
+    
+    def __init__(self, algorithm, signing_key_file=None, previous_key_files=()):
+        self.algorithm = algorithm
+        self.signing_key = SECRET_KEY
+        self.kid = None
+        self.public_keys = {}  # kid -> (public key, algorithm, jwk)
+        
+        if algorithm == 'HS256':
+            return
+        
+        self.signing_key = load_signing_key(signing_key_file, algorithm)
+        for public_key in [self.signing_key.public_key()] + [load_public_key(path) for path in previous_key_files]:
+            jwk = to_jwk(public_key)
+            self.public_keys[jwk['kid']] = (public_key, jwk['alg'], jwk)
+        
+        self.kid = to_jwk(self.signing_key.public_key())['kid']
+        self._jwks = json.dumps({'keys': [jwk for _, _, jwk in self.public_keys.values()]})
+    
+    def sign(self, payload):
+        """Sign a token payload with the current key, naming it in the kid header"""
+        if self.kid:
+            return jwt.encode(payload, self.signing_key, algorithm=self.algorithm, headers={'kid': self.kid})
+        return jwt.encode(payload, self.signing_key, algorithm=self.algorithm)
+    
+    def decode(self, token):
+        """Decode a token and check its signature and expiry
+        
+        With an asymmetric algorithm, HS256 tokens are only accepted until
+        LEGACY_HS256_UNTIL, so tokens issued before the switch stay valid until
+        they expire without SECRET_KEY remaining a way to forge tokens.
+        
+        Raises:
+            jwt.InvalidTokenError: If the token is malformed, forged, expired or signed by an unknown key
+        """
+        # Audience validation is disabled: tokens are accepted from any relying service
+        options = {"verify_aud": False}
+        
+        header = jwt.get_unverified_header(token)
+        if header.get('alg') == 'HS256':
+            if self.algorithm != 'HS256' and not (LEGACY_HS256_UNTIL and datetime.utcnow() < LEGACY_HS256_UNTIL):
+                raise jwt.InvalidTokenError("HS256 tokens are no longer accepted")
+            return jwt.decode(token, SECRET_KEY, options=options, algorithms=["HS256"])
+        
+        entry = self.public_keys.get(header.get('kid'))
+        if not entry:
+            raise jwt.InvalidTokenError("Unknown signing key")
+        
+        public_key, algorithm, _ = entry
+        return jwt.decode(token, public_key, options=options, algorithms=[algorithm])
+    
+    def jwks(self):
+        """Get the JSON Web Key Set of every accepted public key, serialized"""
+        return self._jwks if self.kid else json.dumps({'keys': []})
+
+# Shared key ring used to issue and verify tokens
+keyring = KeyRing(TOKEN_SIGNING_ALGORITHM, TOKEN_SIGNING_KEY_FILE, TOKEN_PREVIOUS_KEY_FILES)
@@ -0,0 +1,106 @@
+import os
+import queue
+import atexit
+import random
+import logging
+import logging.handlers
+from pathlib import Path
+from dotenv import load_dotenv
+
+# Load environment variables
+project_root = Path(__file__).parent.parent
+env_path = project_root / '.env'
+load_dotenv(dotenv_path=env_path)
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Default level, plus per-module overrides, e.g. "verifytoken=WARNING,db=INFO"
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+LOG_LEVELS = os.environ.get('LOG_LEVELS', '')
+# Fraction of records kept per event, e.g. "verifytoken.token_verified=0.01".
+# Events are tagged on hot-path log calls with extra={'event': ...}.
+LOG_SAMPLING = os.environ.get('LOG_SAMPLING', '')
+# Records are dropped rather than blocking a request when the queue is full
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', '10000'))
+
+listener = None
+
+def parse_settings(value):
+    """Parse "name=value,name=value" into a dict"""
+    settings = {}
+    for item in value.split(','):
+        name, _, setting = item.partition('=')
+        if name.strip() and setting.strip():
+            settings[name.strip()] = setting.strip()
+    return settings
+
+class SamplingFilter(logging.Filter):
+    """Keep only a configured fraction of records for each sampled event"""
+    
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+    
+    def filter(self, record):
+        event = getattr(record, 'event', None)
+        if event is None:
+            return True
+        
+        rate = self.rates.get(f"{record.name}.{event}")
+        return rate is None or random.random() < rate
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records instead of blocking when the queue is full
+    
+    Records are queued unformatted: the queue never leaves this process, so
+    the listener thread can format them, unlike the stdlib prepare() which
+    formats every record on the logging thread.
+    """
+    
+    dropped = 0
+    
+    def prepare(self, record):
+        return record
+    
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+def setup_logging():
+    """Route all logging through a queue drained by a background thread
+    
+    Request threads only filter and enqueue records; formatting them and
+    writing to stderr happen on the listener thread. Records below the
+    configured level are never formatted, as long as log calls pass their
+    arguments separately (logger.info("... %s", value)) rather than as
+    f-strings. Safe to call more than once.
+    """
+    global listener
+    
+    if listener:
+        return
+    
+    log_queue = queue.Queue(LOG_QUEUE_SIZE)
+    
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    
+    queue_handler = DroppingQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(
+        {event: float(rate) for event, rate in parse_settings(LOG_SAMPLING).items()}
+    ))
+    
+    root = logging.getLogger()
+    root.setLevel(LOG_LEVEL)
+    root.addHandler(queue_handler)
+    
+    for name, level in parse_settings(LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level.upper())
+    
+    listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    listener.start()
+    
+    # Drain whatever is still queued on shutdown
+    atexit.register(listener.stop)
@@ -1,45 +1,81 @@
-import bcrypt  # Using bcrypt instead of Werkzeug
+import os
+import atexit
+import datetime
 import logging
+import threading
 from . import db
+from .hashing import check_password, HashingBusy
+from .throttle import throttle, THROTTLE_ENABLED
 
 # Configure logging
 logger = logging.getLogger('login')
 
-def login_user(email, password, redirect_service=None):
+# last_login updates are buffered in memory and written in batches, every
+# LAST_LOGIN_FLUSH_INTERVAL seconds or once LAST_LOGIN_FLUSH_SIZE users are pending
+LAST_LOGIN_WRITE_BEHIND = os.environ.get('LAST_LOGIN_WRITE_BEHIND', 'True').lower() == 'true'
+LAST_LOGIN_FLUSH_INTERVAL = float(os.environ.get('LAST_LOGIN_FLUSH_INTERVAL', '0.5'))
+LAST_LOGIN_FLUSH_SIZE = int(os.environ.get('LAST_LOGIN_FLUSH_SIZE', '500'))
+
+def login_user(email, password, redirect_service=None, client_ip=None):
     """Log in a user with the given credentials
     
     Args:
         email (str): User's email
         password (str): User's password
         redirect_service (str, optional): Service to redirect to after login
+        client_ip (str, optional): Client address, used for per-IP throttling
         
     Returns:
         dict: Result containing success status, user data if successful, and error message if unsuccessful
     """
+    # Reject throttled attempts before any database or bcrypt work
+    if THROTTLE_ENABLED:
+        retry_after = throttle.check(email, client_ip)
+        if retry_after:
+            logger.warning("Throttled login attempt for email: %s from %s", email, client_ip)
+            return {
+                'success': False,
+                'error': 'Too many login attempts, please try again later',
+                'retry_after': retry_after
+            }
+    
     # Check if user exists
     user = get_user_by_email(email)
     
     # Verify password with bcrypt
     if not user:
-        logger.warning(f"Login attempt for non-existent email: {email}")
+        logger.warning("Login attempt for non-existent email: %s", email)
+        if THROTTLE_ENABLED:
+            throttle.record_failure(email)
         return {
             'success': False,
             'error': 'Invalid email or password'
         }
         
-    # Convert input password to bytes
-    password_bytes = password.encode('utf-8') if isinstance(password, str) else password
-    # Convert stored hash to bytes if it's not already
-    stored_hash = user['password_hash'].encode('utf-8') if isinstance(user['password_hash'], str) else user['password_hash']
-    
-    # Check if password matches
-    if not bcrypt.checkpw(password_bytes, stored_hash):
-        logger.warning(f"Failed login attempt for email: {email}")
+    # Check if password matches (bcrypt runs on the hashing pool)
+    try:
+        password_matches = check_password(password, user['password_hash'])
+    except HashingBusy:
+        if THROTTLE_ENABLED:
+            throttle.refund(email, client_ip)
+        return {
+            'success': False,
+            'error': 'The server is busy, please try again',
+            'busy': True
+        }
+    
+    if not password_matches:
+        logger.warning("Failed login attempt for email: %s", email)
+        if THROTTLE_ENABLED:
+            throttle.record_failure(email)
         return {
             'success': False,
             'error': 'Invalid email or password'
         }
     
+    if THROTTLE_ENABLED:
+        throttle.record_success(email, client_ip)
+    
     # Update last login time
     update_last_login(user['id'])
     
@@ -56,16 +92,21 @@ def login_user(email, password, redirect_service=None):
     if redirect_service:
         # Import here to avoid circular imports
         from .gentoken import generate_token
-        token = generate_token(user['id'], redirect_service)
+        token = generate_token(user['id'], redirect_service, user=user)
+        if not token:
+            return {
+                'success': False,
+                'error': 'Failed to sign in to the service, please try again'
+            }
         result['token'] = token
         result['redirect_service'] = redirect_service
         
-    logger.info(f"User logged in: {user['email']}")
+    logger.info("User logged in: %s", user['email'], extra={'event': 'user_logged_in'})
     return result
 
 def get_user_by_email(email):
     """Get a user by email"""
-    query = "SELECT id, username, email, password_hash, created_at, last_login FROM users WHERE email = %s"
+    query = "SELECT id, username, email, password_hash, created_at, last_login FROM users WHERE LOWER(email) = LOWER(%s)"
     row = db.execute_query(query, (email,), fetchone=True)
     
     if row:
@@ -95,6 +136,106 @@ def get_user_by_id(user_id):
     return None
 
 def update_last_login(user_id):
-    """Update the user's last login timestamp"""
-    query = "UPDATE users SET last_login = NOW() WHERE id = %s"
-    db.execute_query(query, (user_id,), commit=True)
\ No newline at end of file
+    """Update the user's last login timestamp
+    
+    With LAST_LOGIN_WRITE_BEHIND enabled the update is queued and written by
+    last_login_buffer shortly afterwards instead of on the request thread.
+    Both paths store the application's UTC time, never the database clock,
+    so last_login means the same thing whichever path wrote it.
+    """
+    logged_in_at = datetime.datetime.utcnow()
+    
+    if LAST_LOGIN_WRITE_BEHIND:
+        last_login_buffer.add(user_id, logged_in_at)
+        return
+    
+    query = "UPDATE users SET last_login = %s WHERE id = %s"
+    db.execute_query(query, (logged_in_at, user_id), commit=True)
+
+class LastLoginBuffer:
+    """Write-behind buffer collecting last_login timestamps for batched updates
+    
+    Only the latest timestamp per user is kept, and a background thread writes
+    them all with a single UPDATE.
+    """
+    
+    def __init__(self, interval=LAST_LOGIN_FLUSH_INTERVAL, max_pending=LAST_LOGIN_FLUSH_SIZE):
+        self.interval = interval
+        self.max_pending = max_pending
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+    
+    def add(self, user_id, timestamp):
+        """Queue a user's last login timestamp"""
+        with self._lock:
+            self._pending[user_id] = timestamp
+            full = len(self._pending) >= self.max_pending
+            
+            # Started lazily so forked workers each get their own thread
+            if self._thread is None and not self._stopped.is_set():
+                self._thread = threading.Thread(target=self._run, name='last-login-flush', daemon=True)
+                self._thread.start()
+        
+        if full:
+            self._wake.set()
+    
+    def flush(self):
+        """Write every pending timestamp in one statement
+        
+        Returns:
+            int: Number of users updated
+        """
+        with self._lock:
+            batch, self._pending = self._pending, {}
+        
+        if not batch:
+            return 0
+        
+        # unnest keeps the statement text constant regardless of batch size, so
+        # it is prepared once. Never move last_login backwards if another worker
+        # already wrote a newer login.
+        query = """
+        UPDATE users AS u
+        SET last_login = v.last_login
+        FROM unnest(%s::integer[], %s::timestamp[]) AS v(id, last_login)
+        WHERE u.id = v.id AND (u.last_login IS NULL OR u.last_login < v.last_login)
+        """
+        try:
+            if db.storage.name == 'sqlite':
+                # In-process, so one small UPDATE per user in a single transaction is cheap
+                db.execute_many("""
+                UPDATE users SET last_login = %s
+                WHERE id = %s AND (last_login IS NULL OR last_login < %s)
+                """, [(timestamp, user_id, timestamp) for user_id, timestamp in batch.items()])
+            else:
+                db.execute_query(query, (list(batch), list(batch.values())), commit=True)
+        except Exception as e:
+            logger.error(f"Failed to flush {len(batch)} last_login update(s): {str(e)}")
+            # Put the batch back unless newer timestamps arrived meanwhile
+            with self._lock:
+                for user_id, timestamp in batch.items():
+                    self._pending.setdefault(user_id, timestamp)
+            return 0
+        
+        return len(batch)
+    
+    def stop(self):
+        """Stop the flush thread and write out anything still pending"""
+        self._stopped.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join()
+        self.flush()
+    
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+
+# Shared buffer used by update_last_login, flushed on interpreter shutdown
+last_login_buffer = LastLoginBuffer()
+atexit.register(last_login_buffer.stop)
\ No newline at end of file
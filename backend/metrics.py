@@ -0,0 +1,163 @@
+import bisect
+import threading
+
+# Default histogram bucket upper bounds (seconds)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Everything rendered by /metrics
+registry = []
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+def format_labels(labels):
+    """Render a label dict in the Prometheus text format"""
+    if not labels:
+        return ''
+    pairs = []
+    for name, value in labels.items():
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+def format_sample(name, labels, value):
+    return f"{name}{format_labels(labels)} {format_value(value)}"
+
+class Metric:
+    """Base class for metrics kept in process and rendered by /metrics
+    
+    Args:
+        name (str): Metric name
+        documentation (str): HELP text
+        labelnames (tuple): Label names; values are passed as keyword arguments
+    """
+    
+    type = None
+    
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+        registry.append(self)
+    
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+    
+    def _labels(self, key):
+        return dict(zip(self.labelnames, key))
+    
+    def collect(self):
+        """Get the exposition lines for this metric"""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in values:
+            lines.append(format_sample(self.name, self._labels(key), value))
+        return lines
+
+class Counter(Metric):
+    """Monotonically increasing count"""
+    
+    type = 'counter'
+    
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        # Unlabelled counters are exported as 0 before the first increment
+        if not self.labelnames:
+            self._values[()] = 0
+    
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Histogram(Metric):
+    """Distribution of observed values, e.g. durations in seconds"""
+    
+    type = 'histogram'
+    
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+    
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                # Per-bucket counts (last one is +Inf), then sum
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+    
+    def collect(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        with self._lock:
+            values = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        for key, counts, total in values:
+            lines.extend(format_histogram(self.name, self._labels(key), zip(self.buckets + (float('inf'),), counts), total))
+        return lines
+
+def format_histogram(name, labels, buckets, total):
+    """Render per-bucket (bound, count) pairs as cumulative Prometheus histogram lines"""
+    lines = []
+    cumulative = 0
+    for bound, count in buckets:
+        cumulative += count
+        lines.append(format_sample(f"{name}_bucket", dict(labels, le=format_value(float(bound))), cumulative))
+    lines.append(format_sample(f"{name}_sum", labels, total))
+    lines.append(format_sample(f"{name}_count", labels, cumulative))
+    return lines
+
+class Collector:
+    """Metrics produced by a function at scrape time
+    
+    Args:
+        function (callable): Returns a list of exposition lines
+    """
+    
+    def __init__(self, function):
+        self.function = function
+        registry.append(self)
+    
+    def collect(self):
+        return self.function()
+
+def render():
+    """Render every registered metric in the Prometheus text exposition format"""
+    lines = []
+    for metric in registry:
+        lines.extend(metric.collect())
+    return '\n'.join(lines) + '\n'
+
+# Shared metrics
+REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds', 'HTTP request latency by route',
+    ('method', 'route', 'status')
+)
+QUERY_DURATION = Histogram(
+    'db_query_duration_seconds', 'Time spent in db.execute_query by statement',
+    ('statement',)
+)
+PASSWORD_HASH_DURATION = Histogram(
+    'password_hash_duration_seconds', 'bcrypt time on the hashing pool, excluding queueing',
+    ('operation',), buckets=(0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1, 2.5, 5)
+)
+PASSWORD_HASH_REJECTIONS = Counter(
+    'password_hash_rejections_total', 'bcrypt calls rejected because the hashing queue was full'
+)
+JWT_DURATION = Histogram(
+    'jwt_duration_seconds', 'JWT encode and decode time',
+    ('operation',), buckets=(0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.005, 0.01)
+)
+VERIFICATIONS = Counter(
+    'token_verifications_total', 'Token verification outcomes',
+    ('outcome',)
+)
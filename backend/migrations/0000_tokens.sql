@@ -0,0 +1,12 @@
+-- The tokens table as it was first created. Later migrations reshape it (token
+-- digests, revocation, partitioning), so it is created here rather than by
+-- db.create_tables, which would otherwise leave an unmigrated database with the
+-- original token_value schema. A no-op on databases that already have tokens.
+CREATE TABLE IF NOT EXISTS tokens (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users(id),
+    token_value VARCHAR(500) NOT NULL,
+    created_at TIMESTAMP DEFAULT NOW(),
+    expires_at TIMESTAMP NOT NULL,
+    issued_for VARCHAR(255) NULL
+);
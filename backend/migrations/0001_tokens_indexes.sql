@@ -0,0 +1,4 @@
+-- Indexes for token verification lookups, per-user token queries and expiry scans
+CREATE INDEX IF NOT EXISTS idx_tokens_token_value ON tokens (token_value);
+CREATE INDEX IF NOT EXISTS idx_tokens_user_id ON tokens (user_id);
+CREATE INDEX IF NOT EXISTS idx_tokens_expires_at ON tokens (expires_at);
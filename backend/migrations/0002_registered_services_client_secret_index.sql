@@ -0,0 +1,2 @@
+-- API key lookups in check_api_auth search by client_secret
+CREATE INDEX IF NOT EXISTS idx_registered_services_client_secret ON registered_services (client_secret);
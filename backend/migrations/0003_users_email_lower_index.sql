@@ -0,0 +1,2 @@
+-- Case-insensitive email lookups used by login and signup
+CREATE INDEX IF NOT EXISTS idx_users_email_lower ON users (LOWER(email));
@@ -0,0 +1,7 @@
+-- Token IDs (the JWT jti claim) and revocation timestamps for logout and the stateless denylist
+ALTER TABLE tokens ADD COLUMN IF NOT EXISTS jti VARCHAR(36) NULL;
+ALTER TABLE tokens ADD COLUMN IF NOT EXISTS revoked_at TIMESTAMP NULL;
+
+CREATE INDEX IF NOT EXISTS idx_tokens_jti ON tokens (jti);
+-- Only revoked rows are indexed, which keeps incremental denylist syncs cheap
+CREATE INDEX IF NOT EXISTS idx_tokens_revoked_at ON tokens (revoked_at) WHERE revoked_at IS NOT NULL;
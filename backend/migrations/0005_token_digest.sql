@@ -0,0 +1,15 @@
+-- Store a fixed-size SHA-256 digest of each token instead of the full JWT.
+-- Existing rows are backfilled from token_value before the column is dropped.
+ALTER TABLE tokens ADD COLUMN IF NOT EXISTS token_digest BYTEA NULL;
+
+UPDATE tokens
+SET token_digest = sha256(convert_to(token_value, 'UTF8'))
+WHERE token_digest IS NULL;
+
+ALTER TABLE tokens ALTER COLUMN token_digest SET NOT NULL;
+ALTER TABLE tokens ADD CONSTRAINT tokens_token_digest_length CHECK (octet_length(token_digest) = 32);
+
+CREATE INDEX IF NOT EXISTS idx_tokens_token_digest ON tokens (token_digest);
+
+DROP INDEX IF EXISTS idx_tokens_token_value;
+ALTER TABLE tokens DROP COLUMN token_value;
@@ -0,0 +1,7 @@
+-- Shared login throttling state for THROTTLE_BACKEND=database.
+-- UNLOGGED: counters are cheap to lose on a crash and shouldn't cost WAL writes.
+CREATE UNLOGGED TABLE IF NOT EXISTS login_throttle (
+    key VARCHAR(320) PRIMARY KEY,
+    state TEXT NOT NULL,
+    expires_at TIMESTAMP NOT NULL
+);
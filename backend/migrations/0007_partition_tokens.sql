@@ -0,0 +1,50 @@
+-- Range-partition tokens by expires_at into daily partitions (tokens_pYYYYMMDD),
+-- so expired tokens are removed by dropping whole partitions instead of DELETEs.
+-- Tokens that expired before yesterday are not carried over.
+ALTER TABLE tokens RENAME TO tokens_unpartitioned;
+ALTER SEQUENCE tokens_id_seq OWNED BY NONE;
+
+CREATE TABLE tokens (
+    id INTEGER NOT NULL DEFAULT nextval('tokens_id_seq'),
+    user_id INTEGER NOT NULL,
+    token_digest BYTEA NOT NULL,
+    created_at TIMESTAMP DEFAULT NOW(),
+    expires_at TIMESTAMP NOT NULL,
+    issued_for VARCHAR(255) NULL,
+    jti VARCHAR(36) NULL,
+    revoked_at TIMESTAMP NULL,
+    CONSTRAINT tokens_token_digest_length CHECK (octet_length(token_digest) = 32)
+) PARTITION BY RANGE (expires_at);
+
+DO $$
+DECLARE
+    day DATE := CURRENT_DATE - 1;
+    last_day DATE;
+BEGIN
+    SELECT GREATEST(MAX(expires_at)::date, CURRENT_DATE) + 7 INTO last_day FROM tokens_unpartitioned;
+    last_day := COALESCE(last_day, CURRENT_DATE + 7);
+
+    WHILE day <= last_day LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF tokens FOR VALUES FROM (%L) TO (%L)',
+            'tokens_p' || to_char(day, 'YYYYMMDD'), day, day + 1
+        );
+        day := day + 1;
+    END LOOP;
+END $$;
+
+INSERT INTO tokens (id, user_id, token_digest, created_at, expires_at, issued_for, jti, revoked_at)
+SELECT id, user_id, token_digest, created_at, expires_at, issued_for, jti, revoked_at
+FROM tokens_unpartitioned
+WHERE expires_at >= CURRENT_DATE - 1;
+
+DROP TABLE tokens_unpartitioned;
+ALTER SEQUENCE tokens_id_seq OWNED BY tokens.id;
+
+-- Unique constraints on a partitioned table must include the partition key
+ALTER TABLE tokens ADD PRIMARY KEY (id, expires_at);
+ALTER TABLE tokens ADD CONSTRAINT tokens_user_id_fkey FOREIGN KEY (user_id) REFERENCES users(id);
+CREATE INDEX idx_tokens_token_digest ON tokens (token_digest);
+CREATE INDEX idx_tokens_user_id ON tokens (user_id);
+CREATE INDEX idx_tokens_jti ON tokens (jti);
+CREATE INDEX idx_tokens_revoked_at ON tokens (revoked_at) WHERE revoked_at IS NOT NULL;
@@ -0,0 +1,42 @@
+-- Notify every worker of writes that invalidate in-memory caches (see db.ChangeListener).
+-- Notifications are delivered on commit; payloads carry identifiers only, never secrets.
+-- The table name is passed as a trigger argument, since on tokens the trigger
+-- fires on a partition (tokens_pYYYYMMDD) and TG_TABLE_NAME names that instead.
+CREATE OR REPLACE FUNCTION notify_auth_change() RETURNS trigger AS $$
+DECLARE
+    payload JSON;
+BEGIN
+    IF TG_ARGV[0] = 'tokens' THEN
+        payload := json_build_object(
+            'table', 'tokens',
+            'digest', encode(NEW.token_digest, 'hex'),
+            'jti', NEW.jti,
+            'expires_at', NEW.expires_at
+        );
+    ELSIF TG_OP = 'DELETE' THEN
+        payload := json_build_object('table', TG_ARGV[0], 'id', OLD.id);
+    ELSE
+        payload := json_build_object('table', TG_ARGV[0], 'id', NEW.id);
+    END IF;
+
+    PERFORM pg_notify('auth_changes', payload::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS registered_services_notify ON registered_services;
+CREATE TRIGGER registered_services_notify
+    AFTER INSERT OR UPDATE OR DELETE ON registered_services
+    FOR EACH ROW EXECUTE FUNCTION notify_auth_change('registered_services');
+
+-- Only changes to what verification returns; last_login updates stay silent
+DROP TRIGGER IF EXISTS users_notify ON users;
+CREATE TRIGGER users_notify
+    AFTER UPDATE OF username, email OR DELETE ON users
+    FOR EACH ROW EXECUTE FUNCTION notify_auth_change('users');
+
+DROP TRIGGER IF EXISTS tokens_revoked_notify ON tokens;
+CREATE TRIGGER tokens_revoked_notify
+    AFTER UPDATE OF revoked_at ON tokens
+    FOR EACH ROW WHEN (NEW.revoked_at IS NOT NULL AND OLD.revoked_at IS NULL)
+    EXECUTE FUNCTION notify_auth_change('tokens');
@@ -0,0 +1,27 @@
+-- Emails are unique regardless of case. Signup checks LOWER(email) first, but
+-- only a unique index stops two concurrent signups from both passing the check.
+-- Accounts whose emails differ only in case must be merged by hand first: the
+-- migration refuses to run while any remain, and lists them.
+DO $$
+DECLARE
+    duplicates TEXT;
+BEGIN
+    SELECT string_agg(email_lower, ', ') INTO duplicates
+    FROM (
+        SELECT LOWER(email) AS email_lower
+        FROM users
+        GROUP BY LOWER(email)
+        HAVING COUNT(*) > 1
+        ORDER BY 1
+        LIMIT 20
+    ) case_variants;
+
+    IF duplicates IS NOT NULL THEN
+        RAISE EXCEPTION 'Emails registered more than once with different case, merge these accounts first: %', duplicates;
+    END IF;
+END
+$$;
+
+-- Replaces the plain index from 0003, serving the same lookups
+CREATE UNIQUE INDEX IF NOT EXISTS idx_users_email_lower_unique ON users (LOWER(email));
+DROP INDEX IF EXISTS idx_users_email_lower;
@@ -0,0 +1,25 @@
+-- Send token expiry as seconds since the epoch rather than a timestamp string:
+-- json_build_object trims trailing zeros from fractional seconds, which
+-- datetime.fromisoformat rejects before Python 3.11. expires_at holds UTC, and
+-- extract(epoch) treats a timestamp without time zone as UTC.
+CREATE OR REPLACE FUNCTION notify_auth_change() RETURNS trigger AS $$
+DECLARE
+    payload JSON;
+BEGIN
+    IF TG_ARGV[0] = 'tokens' THEN
+        payload := json_build_object(
+            'table', 'tokens',
+            'digest', encode(NEW.token_digest, 'hex'),
+            'jti', NEW.jti,
+            'expires_at', extract(epoch FROM NEW.expires_at)
+        );
+    ELSIF TG_OP = 'DELETE' THEN
+        payload := json_build_object('table', TG_ARGV[0], 'id', OLD.id);
+    ELSE
+        payload := json_build_object('table', TG_ARGV[0], 'id', NEW.id);
+    END IF;
+
+    PERFORM pg_notify('auth_changes', payload::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,212 @@
+import time
+import logging
+import threading
+import psycopg2
+import psycopg2.extensions
+
+# Configure logging
+logger = logging.getLogger('pool')
+
+# Upper bounds (seconds) of the checkout wait-time histogram buckets
+WAIT_TIME_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes available within the checkout timeout"""
+
+class ConnectionPool:
+    """Thread-safe PostgreSQL connection pool with bounded waiting
+    
+    When every connection is in use, getconn waits up to `timeout` seconds
+    for one to be returned instead of failing straight away.
+    
+    Args:
+        minconn (int): Connections opened up front and kept open while idle
+        maxconn (int): Maximum number of open connections
+        timeout (float): Seconds getconn waits for a free connection before raising PoolTimeout
+        max_lifetime (float): Seconds after which a connection is closed instead of reused
+        max_idle (float): Seconds an idle connection above minconn is kept open
+        check_after (float): Idle seconds after which a connection is pinged before being handed out
+        **kwargs: Connection parameters passed to psycopg2.connect
+    """
+    
+    def __init__(self, minconn, maxconn, timeout=10, max_lifetime=3600, max_idle=600,
+                 check_after=30, **kwargs):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.max_idle = max_idle
+        self.check_after = check_after
+        self._kwargs = kwargs
+        
+        self._cond = threading.Condition()
+        self._idle = []  # (connection, returned_at), most recently returned last
+        self._created_at = {}
+        self._in_use = set()
+        self._size = 0
+        self._closed = False
+        
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.wait_counts = [0] * (len(WAIT_TIME_BUCKETS) + 1)
+        self.wait_sum = 0.0
+        
+        for _ in range(minconn):
+            conn = self._connect()
+            with self._cond:
+                self._size += 1
+                self._idle.append((conn, time.monotonic()))
+    
+    def getconn(self, timeout=None):
+        """Check out a connection, waiting up to timeout seconds for one to be free"""
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+        
+        while True:
+            conn, returned_at = self._acquire(deadline)
+            
+            if conn is None:
+                # A slot was reserved for a new connection
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self.checkout_failures += 1
+                        self._cond.notify()
+                    raise
+            elif time.monotonic() - returned_at > self.check_after and not self._is_alive(conn):
+                logger.warning("Discarding dead pooled connection")
+                with self._cond:
+                    self._discard(conn)
+                continue
+            
+            with self._cond:
+                self._in_use.add(conn)
+                self._record_wait(time.monotonic() - started)
+            return conn
+    
+    def putconn(self, conn, close=False):
+        """Return a connection to the pool"""
+        status = None
+        if not conn.closed:
+            status = conn.info.transaction_status
+        
+        # Never hand out a connection with a transaction left open
+        if status not in (None, psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN,
+                          psycopg2.extensions.TRANSACTION_STATUS_IDLE):
+            try:
+                conn.rollback()
+            except Exception:
+                close = True
+        
+        with self._cond:
+            self._in_use.discard(conn)
+            
+            if (close or self._closed or conn.closed
+                    or status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN
+                    or self._age(conn) > self.max_lifetime):
+                self._discard(conn)
+            else:
+                self._idle.append((conn, time.monotonic()))
+            
+            self._cond.notify()
+    
+    def closeall(self):
+        """Close every idle connection and stop handing out new ones"""
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                conn, _ = self._idle.pop()
+                self._discard(conn)
+            self._cond.notify_all()
+    
+    def stats(self):
+        """Get pool size, usage and checkout wait-time statistics"""
+        with self._cond:
+            return {
+                'size': self._size,
+                'in_use': len(self._in_use),
+                'idle': len(self._idle),
+                'min': self.minconn,
+                'max': self.maxconn,
+                'checkouts': self.checkouts,
+                'checkout_failures': self.checkout_failures,
+                'wait_time_buckets': list(zip(WAIT_TIME_BUCKETS + (float('inf'),), self.wait_counts)),
+                'wait_time_sum': self.wait_sum
+            }
+    
+    def _acquire(self, deadline):
+        """Take an idle connection, or reserve a slot for a new one
+        
+        Returns:
+            tuple: (connection, returned_at), or (None, None) when the caller should connect
+        """
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolTimeout("Connection pool is closed")
+                
+                self._reap_idle()
+                
+                while self._idle:
+                    conn, returned_at = self._idle.pop()
+                    if conn.closed or self._age(conn) > self.max_lifetime:
+                        self._discard(conn)
+                        continue
+                    return conn, returned_at
+                
+                if self._size < self.maxconn:
+                    self._size += 1
+                    return None, None
+                
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.checkout_failures += 1
+                    raise PoolTimeout("No database connection available before the checkout timeout")
+                
+                self._cond.wait(remaining)
+    
+    def _reap_idle(self):
+        """Close the least recently used idle connections past max_idle, keeping minconn open"""
+        now = time.monotonic()
+        while self._idle and self._size > self.minconn and now - self._idle[0][1] > self.max_idle:
+            conn, _ = self._idle.pop(0)
+            self._discard(conn)
+    
+    def _connect(self):
+        conn = psycopg2.connect(**self._kwargs)
+        self._created_at[conn] = time.monotonic()
+        return conn
+    
+    def _discard(self, conn):
+        """Close a connection and free its slot; the caller holds the lock"""
+        self._size -= 1
+        self._created_at.pop(conn, None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+    
+    def _age(self, conn):
+        return time.monotonic() - self._created_at.get(conn, time.monotonic())
+    
+    def _is_alive(self, conn):
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+    
+    def _record_wait(self, seconds):
+        self.checkouts += 1
+        self.wait_sum += seconds
+        for index, bound in enumerate(WAIT_TIME_BUCKETS):
+            if seconds <= bound:
+                self.wait_counts[index] += 1
+                return
+        self.wait_counts[-1] += 1
@@ -0,0 +1,208 @@
+import os
+import datetime
+import logging
+import threading
+import jwt
+from . import db
+from .gentoken import token_digest
+from .keys import keyring
+from pathlib import Path
+from dotenv import load_dotenv
+
+# Configure logging
+logger = logging.getLogger('revoketoken')
+
+# Load environment variables
+project_root = Path(__file__).parent.parent
+env_path = project_root / '.env'
+load_dotenv(dotenv_path=env_path)
+
+# How often the in-memory denylist pulls new revocations from the database.
+# This is the longest a revoked token can still pass stateless verification.
+REVOCATION_SYNC_INTERVAL = float(os.environ.get('REVOCATION_SYNC_INTERVAL', '5'))
+# Revocations committed slightly out of order are picked up by re-reading this window
+REVOCATION_SYNC_OVERLAP = datetime.timedelta(seconds=60)
+
+def revoke_token(token):
+    """Revoke a single token, e.g. when the user logs out of a relying service
+    
+    Args:
+        token (str): JWT token to revoke
+    
+    Returns:
+        dict: Result containing success status and error message if unsuccessful
+    """
+    try:
+        # Expired tokens are rejected anyway, so there is nothing to revoke
+        keyring.decode(token)
+    except jwt.ExpiredSignatureError:
+        return {'success': True}
+    except jwt.InvalidTokenError as e:
+        return {'success': False, 'error': f'Invalid token: {str(e)}'}
+    
+    query = """
+    UPDATE tokens
+    SET revoked_at = NOW()
+    WHERE token_digest = %s AND expires_at > %s AND revoked_at IS NULL
+    RETURNING jti, expires_at
+    """
+    rows = db.execute_query(query, (token_digest(token), datetime.datetime.utcnow()), fetchall=True, commit=True)
+    
+    for jti, expires_at in rows:
+        denylist.add(jti, expires_at)
+    
+    # Imported here: verifytoken imports this module for the denylist
+    from .verifytoken import verify_cache
+    verify_cache.invalidate(token_digest(token))
+    
+    if not rows and not get_revoked_at(token):
+        return {'success': False, 'error': 'Token not found'}
+    
+    logger.info("Token revoked: %s...", token[:20])
+    return {'success': True}
+
+def revoke_user_tokens(user_id):
+    """Revoke every unexpired token issued to a user
+    
+    Returns:
+        int: Number of tokens revoked
+    """
+    query = """
+    UPDATE tokens
+    SET revoked_at = NOW()
+    WHERE user_id = %s AND revoked_at IS NULL AND expires_at > %s
+    RETURNING jti, expires_at
+    """
+    rows = db.execute_query(query, (user_id, datetime.datetime.utcnow()), fetchall=True, commit=True)
+    
+    for jti, expires_at in rows:
+        denylist.add(jti, expires_at)
+    
+    # Cached results are keyed by token digest, not user, so drop them all
+    from .verifytoken import verify_cache
+    verify_cache.clear()
+    
+    logger.info("Revoked %s token(s) for user %s", len(rows), user_id)
+    return len(rows)
+
+def get_revoked_at(token_value):
+    """Get when a token was revoked, or None if it isn't revoked or doesn't exist"""
+    query = "SELECT revoked_at FROM tokens WHERE token_digest = %s AND expires_at > %s"
+    row = db.execute_query(query, (token_digest(token_value), datetime.datetime.utcnow()), fetchone=True)
+    
+    if row:
+        return row[0]
+    return None
+
+class RevocationDenylist:
+    """In-memory set of revoked token IDs (jti) for stateless verification
+    
+    Only revoked, unexpired tokens are kept, so the set stays small. A
+    background thread pulls revocations newer than the last sync from the
+    database every REVOCATION_SYNC_INTERVAL seconds; checking a token never
+    touches the database.
+    """
+    
+    def __init__(self, interval=REVOCATION_SYNC_INTERVAL):
+        self.interval = interval
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._synced_until = None
+        self._thread = None
+        self._stop = threading.Event()
+    
+    @property
+    def ready(self):
+        """Whether at least one sync has completed"""
+        return self._synced_until is not None
+    
+    def is_revoked(self, jti):
+        """Check whether a token ID has been revoked"""
+        return jti in self._entries
+    
+    def add(self, jti, expires_at):
+        """Add a revoked token ID until its token expires"""
+        if not jti:
+            return
+        with self._lock:
+            self._entries[jti] = expires_at
+    
+    def sync(self):
+        """Pull revocations made since the last sync and drop expired entries"""
+        # revoked_at is set from the database clock, so track progress with it too
+        synced_until = db.execute_query("SELECT LOCALTIMESTAMP", fetchone=True)[0]
+        
+        query = """
+        SELECT jti, expires_at
+        FROM tokens
+        WHERE revoked_at > %s AND expires_at > %s AND jti IS NOT NULL
+        """
+        rows = db.execute_query(query, self.sync_window(), fetchall=True)
+        
+        self.merge(rows, synced_until)
+    
+    def sync_window(self):
+        """Get the (revoked since, expiring after) bounds for the next sync query"""
+        since = datetime.datetime(1970, 1, 1)
+        if self._synced_until is not None:
+            since = self._synced_until - REVOCATION_SYNC_OVERLAP
+        
+        return since, datetime.datetime.utcnow()
+    
+    def merge(self, rows, synced_until):
+        """Merge (jti, expires_at) rows from a sync and drop expired entries
+        
+        Args:
+            rows (list): Revoked token IDs and their expiry times
+            synced_until (datetime): Database time taken before the sync query ran
+        """
+        now = datetime.datetime.utcnow()
+        with self._lock:
+            for jti, expires_at in rows:
+                self._entries[jti] = expires_at
+            
+            for jti in [jti for jti, expires_at in self._entries.items() if expires_at < now]:
+                del self._entries[jti]
+        
+        self._synced_until = synced_until
+    
+    def start(self):
+        """Run an initial sync and start the background sync thread"""
+        if self._thread:
+            return
+        
+        try:
+            self.sync()
+        except Exception as e:
+            logger.error(f"Initial revocation sync failed: {str(e)}")
+        
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='revocation-sync', daemon=True)
+        self._thread.start()
+        logger.info(f"Revocation denylist sync started (every {self.interval}s)")
+    
+    def stop(self):
+        """Stop the background sync thread"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+    
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.sync()
+            except Exception as e:
+                logger.error(f"Revocation sync failed: {str(e)}")
+
+# Shared denylist used by verifytoken in stateless mode
+denylist = RevocationDenylist()
+
+def on_token_revoked(payload):
+    """Add a token revoked by any worker to the denylist without waiting for the next sync"""
+    # Missed notifications are caught up by the periodic sync. Before the first
+    # sync the denylist isn't in use, and nothing would ever expire the entry.
+    if payload and payload['jti'] and denylist.ready:
+        denylist.add(payload['jti'], datetime.datetime.utcfromtimestamp(payload['expires_at']))
+
+db.change_listener.on_change('tokens', on_token_revoked)
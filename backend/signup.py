@@ -1,6 +1,6 @@
 import logging
-import bcrypt
 from . import db
+from .hashing import hash_password, HashingBusy
 from .login import get_user_by_email, get_user_by_id
 
 # Configure logging
@@ -9,24 +9,34 @@ logger = logging.getLogger('signup')
 def signup_user(username, email, password, redirect_service=None):
     """Register a new user"""
     # Check if user already exists
-    existing_user_result = get_user_by_email(email)
-    if (existing_user_result['success']):
-        logger.warning(f"Signup attempt with existing email: {email}")
+    if get_user_by_email(email):
+        logger.warning("Signup attempt with existing email: %s", email)
         return {
             'success': False,
             'error': 'Email already exists'
         }
     
-    # Create password hash using bcrypt
-    # Convert password to bytes if it's not already
-    password_bytes = password.encode('utf-8') if isinstance(password, str) else password
-    # Generate a salt and hash the password
-    salt = bcrypt.gensalt()
-    password_hash = bcrypt.hashpw(password_bytes, salt).decode('utf-8')
+    # Create password hash using bcrypt on the hashing pool
+    try:
+        password_hash = hash_password(password)
+    except HashingBusy:
+        return {
+            'success': False,
+            'error': 'The server is busy, please try again',
+            'busy': True
+        }
     
     # Create new user
     new_user_id = create_user(username, email, password_hash)
     
+    if not new_user_id and get_user_by_email(email):
+        # A concurrent signup registered the same email after our check
+        logger.warning("Signup attempt with existing email: %s", email)
+        return {
+            'success': False,
+            'error': 'Email already exists'
+        }
+    
     if not new_user_id:
         logger.error(f"Failed to create user with email: {email}")
         return {
@@ -35,8 +45,7 @@ def signup_user(username, email, password, redirect_service=None):
         }
     
     # Get the user data
-    new_user_result = get_user_by_id(new_user_id)
-    new_user = new_user_result['user']
+    new_user = get_user_by_id(new_user_id)
     
     result = {
         'success': True,
@@ -51,18 +60,24 @@ def signup_user(username, email, password, redirect_service=None):
     if redirect_service:
         # Import here to avoid circular imports
         from .gentoken import generate_token
-        token = generate_token(new_user_id, redirect_service)
+        token = generate_token(new_user_id, redirect_service, user=new_user)
+        if not token:
+            return {
+                'success': False,
+                'error': 'Your account was created, but signing in to the service failed. Please sign in.'
+            }
         result['token'] = token
         result['redirect_service'] = redirect_service
     
-    logger.info(f"New user created: {email}")
+    logger.info("New user created: %s", email)
     return result
 
 def create_user(username, email, password_hash):
-    """Create a new user"""
+    """Create a new user, or return None if the email (in any case) is already taken"""
     query = """
     INSERT INTO users (username, email, password_hash)
     VALUES (%s, %s, %s)
+    ON CONFLICT DO NOTHING
     RETURNING id
     """
     row = db.execute_query(query, (username, email, password_hash), fetchone=True, commit=True)
@@ -0,0 +1,258 @@
+import re
+import queue
+import sqlite3
+import datetime
+import logging
+import threading
+from pathlib import Path
+from functools import lru_cache
+from contextlib import contextmanager
+from .pool import PoolTimeout
+
+# Configure logging
+logger = logging.getLogger('sqlitestore')
+
+# Same tables as the migrated Postgres schema, minus partitioning
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username VARCHAR(50) NOT NULL,
+    email VARCHAR(100) UNIQUE NOT NULL,
+    password_hash VARCHAR(255) NOT NULL,
+    created_at TIMESTAMP DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now')),
+    last_login TIMESTAMP NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_users_email_lower_unique ON users (LOWER(email));
+DROP INDEX IF EXISTS idx_users_email_lower;
+
+CREATE TABLE IF NOT EXISTS tokens (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL REFERENCES users(id),
+    token_digest BLOB NOT NULL CHECK (length(token_digest) = 32),
+    jti VARCHAR(36) NULL,
+    created_at TIMESTAMP DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now')),
+    expires_at TIMESTAMP NOT NULL,
+    issued_for VARCHAR(255) NULL,
+    revoked_at TIMESTAMP NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tokens_token_digest ON tokens (token_digest);
+CREATE INDEX IF NOT EXISTS idx_tokens_user_id ON tokens (user_id);
+CREATE INDEX IF NOT EXISTS idx_tokens_expires_at ON tokens (expires_at);
+CREATE INDEX IF NOT EXISTS idx_tokens_jti ON tokens (jti);
+CREATE INDEX IF NOT EXISTS idx_tokens_revoked_at ON tokens (revoked_at) WHERE revoked_at IS NOT NULL;
+
+CREATE TABLE IF NOT EXISTS registered_services (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name VARCHAR(100) NOT NULL,
+    domain VARCHAR(255) UNIQUE NOT NULL,
+    client_id VARCHAR(36) UNIQUE NOT NULL,
+    client_secret VARCHAR(64) NULL,
+    created_at TIMESTAMP DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now')),
+    is_active BOOLEAN DEFAULT TRUE
+);
+CREATE INDEX IF NOT EXISTS idx_registered_services_client_secret ON registered_services (client_secret);
+
+CREATE TABLE IF NOT EXISTS login_throttle (
+    key VARCHAR(320) PRIMARY KEY,
+    state TEXT NOT NULL,
+    expires_at TIMESTAMP NOT NULL
+);
+"""
+
+ANY_PATTERN = re.compile(r'=\s*ANY\(%s\)', re.IGNORECASE)
+FOR_UPDATE_PATTERN = re.compile(r'\s+FOR\s+UPDATE\b', re.IGNORECASE)
+
+def adapt_datetime(value):
+    # Fixed-width ISO text, so timestamps compare correctly as strings
+    return value.isoformat(' ', 'microseconds')
+
+def convert_timestamp(value):
+    return datetime.datetime.fromisoformat(value.decode('utf-8'))
+
+def now():
+    """NOW() for SQLite: the current UTC time, like the Postgres server clock"""
+    return adapt_datetime(datetime.datetime.utcnow())
+
+sqlite3.register_adapter(datetime.datetime, adapt_datetime)
+sqlite3.register_converter('TIMESTAMP', convert_timestamp)
+
+@lru_cache(maxsize=1024)
+def translate(query):
+    """Translate the Postgres dialect used by the backend modules into SQLite
+    
+    `= ANY(%s)` becomes an IN list expanded per call, LOCALTIMESTAMP (only
+    ever selected on its own) becomes NOW() typed as a timestamp, and FOR UPDATE
+    is dropped since transactions hold the database's write lock instead.
+    
+    Returns:
+        tuple: (query with ? placeholders, query split on its %s placeholders)
+    """
+    query = ANY_PATTERN.sub('IN %s', query)
+    query = FOR_UPDATE_PATTERN.sub('', query)
+    query = query.replace('LOCALTIMESTAMP', 'NOW() AS "now [TIMESTAMP]"')
+    parts = query.split('%s')
+    return '?'.join(parts), parts
+
+def bind(query, params):
+    """Get the SQLite statement and flat parameters for a query, expanding list parameters"""
+    sql, parts = translate(query)
+    if not params or not any(isinstance(param, (list, tuple)) for param in params):
+        return sql, params or ()
+    
+    pieces = [parts[0]]
+    flat = []
+    for param, part in zip(params, parts[1:]):
+        if isinstance(param, (list, tuple)):
+            pieces.append(f"({', '.join('?' * len(param))})" if param else '(NULL)')
+            flat.extend(param)
+        else:
+            pieces.append('?')
+            flat.append(param)
+        pieces.append(part)
+    return ''.join(pieces), flat
+
+class TranslatingCursor:
+    """Cursor over a SQLite connection that runs queries written for Postgres"""
+    
+    def __init__(self, conn):
+        self._conn = conn
+        self._cursor = None
+    
+    def execute(self, query, params=None):
+        self._cursor = self._conn.execute(*bind(query, params))
+    
+    def fetchone(self):
+        return self._cursor.fetchone()
+    
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+class SQLiteStorage:
+    """Embedded SQLite storage in WAL mode, through a small bounded connection pool
+    
+    WAL lets readers run alongside the single writer, so token verification
+    never waits on logins being written.
+    
+    Args:
+        path (str): Database file, created if it doesn't exist
+        busy_timeout (float): Seconds a writer waits for the write lock, and a caller for a free connection
+        pool_size (int): Maximum number of open connections
+    """
+    
+    name = 'sqlite'
+    
+    def __init__(self, path, busy_timeout=5, pool_size=10):
+        self.path = Path(path)
+        self.busy_timeout = busy_timeout
+        self.pool_size = pool_size
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(pool_size)
+        self._connections = []
+        self._lock = threading.Lock()
+    
+    def connect(self):
+        """Open the database, switch it to WAL mode and create the schema"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.connection() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+        logger.info(f"SQLite database initialized: {self.path}")
+    
+    @contextmanager
+    def connection(self):
+        """Check out a pooled connection, waiting up to busy_timeout seconds for a free one
+        
+        Raises:
+            PoolTimeout: If every connection stays in use for busy_timeout seconds
+        """
+        if not self._slots.acquire(timeout=self.busy_timeout):
+            raise PoolTimeout(f"No SQLite connection available after {self.busy_timeout}s")
+        
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._open()
+            
+            try:
+                yield conn
+            finally:
+                # Uncommitted work is discarded, like a connection returned to the Postgres pool
+                if conn.in_transaction:
+                    conn.rollback()
+                self._idle.put(conn)
+        finally:
+            self._slots.release()
+    
+    def _open(self):
+        conn = sqlite3.connect(
+            self.path,
+            timeout=self.busy_timeout,
+            check_same_thread=False,
+            detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES
+        )
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        conn.create_function('NOW', 0, now)
+        with self._lock:
+            self._connections.append(conn)
+        return conn
+    
+    def execute(self, query, params=None, fetchone=False, fetchall=False, commit=False):
+        """Execute a query, with the same contract as db.execute_query"""
+        sql, params = bind(query, params)
+        
+        with self.connection() as conn:
+            try:
+                cursor = conn.execute(sql, params)
+                rows = cursor.fetchall() if fetchone or fetchall else None
+                cursor.close()
+                
+                if commit:
+                    conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        
+        if fetchone:
+            return rows[0] if rows else None
+        return rows
+    
+    def execute_many(self, query, rows, commit=True):
+        """Execute a query once per parameter tuple in a single transaction"""
+        sql, _ = translate(query)
+        
+        with self.connection() as conn:
+            try:
+                conn.executemany(sql, rows)
+                if commit:
+                    conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+    
+    @contextmanager
+    def transaction(self):
+        """Run several statements in one transaction, committed if the block doesn't raise
+        
+        The write lock is taken up front (BEGIN IMMEDIATE), so concurrent
+        read-modify-write transactions run one after another.
+        
+        Yields:
+            TranslatingCursor: Cursor taking the Postgres dialect, like execute()
+        """
+        with self.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield TranslatingCursor(conn)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+    
+    def close(self):
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+        self._idle = queue.LifoQueue()
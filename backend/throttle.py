@@ -0,0 +1,251 @@
+import os
+import json
+import time
+import random
+import hashlib
+import datetime
+import logging
+import threading
+from . import db
+from .cache import TTLCache
+from pathlib import Path
+from dotenv import load_dotenv
+
+# Configure logging
+logger = logging.getLogger('throttle')
+
+# Load environment variables
+project_root = Path(__file__).parent.parent
+env_path = project_root / '.env'
+load_dotenv(dotenv_path=env_path)
+
+# Login throttling configuration
+THROTTLE_ENABLED = os.environ.get('THROTTLE_ENABLED', 'True').lower() == 'true'
+# 'memory' keeps counters per worker; 'database' shares them across workers and nodes
+THROTTLE_BACKEND = os.environ.get('THROTTLE_BACKEND', 'memory').lower()
+# Token buckets: burst capacity and refill rate in attempts per minute
+THROTTLE_EMAIL_CAPACITY = float(os.environ.get('THROTTLE_EMAIL_CAPACITY', '10'))
+THROTTLE_EMAIL_PER_MINUTE = float(os.environ.get('THROTTLE_EMAIL_PER_MINUTE', '5'))
+THROTTLE_IP_CAPACITY = float(os.environ.get('THROTTLE_IP_CAPACITY', '30'))
+THROTTLE_IP_PER_MINUTE = float(os.environ.get('THROTTLE_IP_PER_MINUTE', '30'))
+# Exponential backoff after consecutive failures (seconds)
+THROTTLE_FREE_FAILURES = int(os.environ.get('THROTTLE_FREE_FAILURES', '3'))
+THROTTLE_BACKOFF_BASE = float(os.environ.get('THROTTLE_BACKOFF_BASE', '1'))
+THROTTLE_BACKOFF_MAX = float(os.environ.get('THROTTLE_BACKOFF_MAX', '900'))
+
+# Longer keys (from unvalidated form input) are replaced by a digest, so they
+# fit login_throttle.key and can't be used to fill memory
+THROTTLE_KEY_MAX_LENGTH = 128
+
+def throttle_key(kind, value):
+    """Get the throttle state key for an email or IP, hashed if it would be too long"""
+    key = f"{kind}:{value}"
+    if len(key) > THROTTLE_KEY_MAX_LENGTH:
+        key = f"{kind}:sha256:{hashlib.sha256(value.encode('utf-8')).hexdigest()}"
+    return key
+
+class MemoryBackend:
+    """Throttle state kept in this process only"""
+    
+    def __init__(self, maxsize=100000):
+        self._cache = TTLCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+    
+    def update(self, keys, apply):
+        """Read, change and write several keys' states under one lock
+        
+        Args:
+            keys (list): Keys to read
+            apply (callable): Takes {key: state or None}, returns ({key: (state, ttl)} to write, result)
+        
+        Returns:
+            The result returned by apply
+        """
+        with self._lock:
+            updates, result = apply({key: self._cache.get(key, None) for key in keys})
+            for key, (state, ttl) in updates.items():
+                self._cache.set(key, state, ttl=ttl)
+        return result
+
+class DatabaseBackend:
+    """Throttle state shared by every worker through the login_throttle table"""
+    
+    def update(self, keys, apply):
+        """Read, change and write several keys' states in one transaction
+        
+        Missing rows are inserted (already expired) so there is always a row
+        to lock, then the rows are locked in key order with SELECT ... FOR UPDATE:
+        concurrent attempts from other workers wait instead of overwriting
+        each other's counts.
+        
+        Args:
+            keys (list): Keys to read
+            apply (callable): Takes {key: state or None}, returns ({key: (state, ttl)} to write, result)
+        
+        Returns:
+            The result returned by apply
+        """
+        now = datetime.datetime.utcnow()
+        keys = sorted(keys)
+        
+        with db.transaction() as cursor:
+            for key in keys:
+                cursor.execute("""
+                INSERT INTO login_throttle (key, state, expires_at)
+                VALUES (%s, %s, %s)
+                ON CONFLICT (key) DO NOTHING
+                """, (key, 'null', now))
+            
+            cursor.execute("""
+            SELECT key, state, expires_at FROM login_throttle
+            WHERE key = ANY(%s)
+            ORDER BY key
+            FOR UPDATE
+            """, (keys,))
+            states = {
+                key: json.loads(state) if expires_at > now else None
+                for key, state, expires_at in cursor.fetchall()
+            }
+            
+            updates, result = apply(states)
+            for key, (state, ttl) in updates.items():
+                cursor.execute(
+                    "UPDATE login_throttle SET state = %s, expires_at = %s WHERE key = %s",
+                    (json.dumps(state), now + datetime.timedelta(seconds=ttl), key)
+                )
+        
+        # Occasionally clear out expired rows so the table stays small
+        if random.random() < 0.01:
+            db.execute_query("DELETE FROM login_throttle WHERE expires_at < %s", (now,), commit=True)
+        
+        return result
+
+BACKENDS = {
+    'memory': MemoryBackend,
+    'database': DatabaseBackend
+}
+
+class LoginThrottle:
+    """Token-bucket login throttling per email and per client IP
+    
+    Each attempt takes a token from both the email's and the IP's bucket,
+    and a successful login gives it back, so only failed attempts count
+    against the limits. After THROTTLE_FREE_FAILURES consecutive failures an
+    email is also blocked for an exponentially growing backoff period. IPs
+    only get a bucket, so one user mistyping a password can't lock out a
+    shared NAT.
+    
+    Args:
+        backend: Object with update(keys, apply) applying changes to state dicts atomically
+    """
+    
+    def __init__(self, backend):
+        self.backend = backend
+        self.limits = {
+            'email': (THROTTLE_EMAIL_CAPACITY, THROTTLE_EMAIL_PER_MINUTE / 60),
+            'ip': (THROTTLE_IP_CAPACITY, THROTTLE_IP_PER_MINUTE / 60)
+        }
+    
+    def check(self, email, client_ip):
+        """Take an attempt from the email and IP buckets
+        
+        Returns:
+            float: 0 if the attempt is allowed, otherwise seconds until the next attempt is
+        """
+        now = time.time()
+        keys = self._keys(email, client_ip)
+        
+        def apply(stored):
+            states = {key: self._refill(kind, stored.get(key), now) for kind, key in keys}
+            
+            retry_after = 0
+            for kind, key in keys:
+                state = states[key]
+                if state['blocked_until'] > now:
+                    retry_after = max(retry_after, state['blocked_until'] - now)
+                elif state['tokens'] < 1:
+                    retry_after = max(retry_after, (1 - state['tokens']) / self.limits[kind][1])
+            
+            if retry_after:
+                return {}, retry_after
+            
+            for kind, key in keys:
+                states[key]['tokens'] -= 1
+            return {key: (states[key], self._ttl(kind, states[key], now)) for kind, key in keys}, 0
+        
+        return self.backend.update([key for _, key in keys], apply)
+    
+    def record_failure(self, email):
+        """Count a failed attempt for an email and start or extend its backoff"""
+        now = time.time()
+        
+        def change(kind, key, state):
+            state['failures'] += 1
+            
+            excess = state['failures'] - THROTTLE_FREE_FAILURES
+            if excess >= 0:
+                backoff = min(THROTTLE_BACKOFF_MAX, THROTTLE_BACKOFF_BASE * 2 ** excess)
+                state['blocked_until'] = now + backoff
+                logger.warning("Login backoff for %s: %.0fs after %s failures", key, backoff, state['failures'])
+        
+        self._update_each(self._keys(email, None), change, now)
+    
+    def record_success(self, email, client_ip=None):
+        """Clear the email's failure count after a successful login and refund the attempt"""
+        now = time.time()
+        
+        def change(kind, key, state):
+            self._give_back(kind, state)
+            if kind == 'email':
+                state['failures'] = 0
+                state['blocked_until'] = 0
+        
+        self._update_each(self._keys(email, client_ip), change, now)
+    
+    def refund(self, email, client_ip=None):
+        """Give back the attempt taken by check, for an attempt that was never evaluated"""
+        now = time.time()
+        self._update_each(self._keys(email, client_ip), lambda kind, key, state: self._give_back(kind, state), now)
+    
+    def _update_each(self, keys, change, now):
+        def apply(stored):
+            updates = {}
+            for kind, key in keys:
+                state = self._refill(kind, stored.get(key), now)
+                change(kind, key, state)
+                updates[key] = (state, self._ttl(kind, state, now))
+            return updates, None
+        
+        self.backend.update([key for _, key in keys], apply)
+    
+    def _give_back(self, kind, state):
+        state['tokens'] = min(self.limits[kind][0], state['tokens'] + 1)
+    
+    def _keys(self, email, client_ip):
+        keys = []
+        if email:
+            keys.append(('email', throttle_key('email', email.lower())))
+        if client_ip:
+            keys.append(('ip', throttle_key('ip', client_ip)))
+        return keys
+    
+    def _refill(self, kind, state, now):
+        capacity, rate = self.limits[kind]
+        if not state:
+            return {'tokens': capacity, 'updated': now, 'failures': 0, 'blocked_until': 0}
+        
+        state = dict(state)
+        state['tokens'] = min(capacity, state['tokens'] + (now - state['updated']) * rate)
+        state['updated'] = now
+        return state
+    
+    def _ttl(self, kind, state, now):
+        capacity, rate = self.limits[kind]
+        # Keep state until the bucket is full again and any backoff has passed
+        ttl = max((capacity - state['tokens']) / rate, state['blocked_until'] - now)
+        if state['failures']:
+            ttl = max(ttl, THROTTLE_BACKOFF_MAX)
+        return ttl + 1
+
+# Shared throttle used by login_user
+throttle = LoginThrottle(BACKENDS[THROTTLE_BACKEND]())
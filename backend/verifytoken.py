@@ -1,8 +1,16 @@
 import os
+import json
+import time
+import base64
 import datetime
 import logging
 import jwt
-from . import db
+from functools import wraps
+from . import db, metrics
+from .cache import TTLCache, MISSING
+from .gentoken import token_digest
+from .keys import keyring
+from .revoketoken import denylist
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -14,11 +22,128 @@ project_root = Path(__file__).parent.parent
 env_path = project_root / '.env'
 load_dotenv(dotenv_path=env_path)
 
-# Get secret key
-SECRET_KEY = os.environ.get('SECRET_KEY', 'dev_secret_key')
+# 'stateful' checks every token against the tokens table. 'stateless' trusts the
+# signed claims and only consults the in-memory revocation denylist.
+TOKEN_VERIFY_MODE = os.environ.get('TOKEN_VERIFY_MODE', 'stateful').lower()
 
+# Maximum number of tokens accepted by a single batch verification
+VERIFY_BATCH_MAX_TOKENS = int(os.environ.get('VERIFY_BATCH_MAX_TOKENS', '100'))
+
+# Token digest -> verification result cache, so an active user's token isn't
+# checked against the database on every request. Valid results are kept for at
+# most VERIFY_CACHE_TTL seconds and never past the token's exp; invalid ones for
+# VERIFY_CACHE_NEGATIVE_TTL. Revocations clear the entry in the revoking worker
+# at once, and in other workers when db.change_listener relays them (otherwise
+# within VERIFY_CACHE_TTL).
+VERIFY_CACHE_SIZE = int(os.environ.get('VERIFY_CACHE_SIZE', '10000'))
+VERIFY_CACHE_TTL = float(os.environ.get('VERIFY_CACHE_TTL', '30'))
+VERIFY_CACHE_NEGATIVE_TTL = float(os.environ.get('VERIFY_CACHE_NEGATIVE_TTL', '5'))
+verify_cache = TTLCache(maxsize=VERIFY_CACHE_SIZE, ttl=VERIFY_CACHE_TTL)
+
+def outcome_label(result):
+    """Get the metrics label for a verification result, e.g. 'valid' or 'token_expired'"""
+    if result['valid']:
+        return 'valid'
+    # Drop exception details after the colon to keep the label set small
+    return result['error'].split(':')[0].lower().replace(' ', '_')
+
+def counted(func):
+    """Count the outcome of every verification made through func"""
+    @wraps(func)
+    def decorated(token):
+        result = func(token)
+        metrics.VERIFICATIONS.inc(outcome=outcome_label(result))
+        return result
+    return decorated
+
+def token_expiry(token):
+    """Read the exp claim of a token whose signature was already checked, or 0 if it has none"""
+    payload = token.split('.')[1]
+    claims = json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))
+    return claims.get('exp', 0)
+
+def check_token_type(token):
+    """Get the result for a token that isn't a non-empty string, or None if it is one"""
+    if not isinstance(token, str):
+        return {'valid': False, 'error': 'Invalid token: Token must be a string'}
+    if not token:
+        return {'valid': False, 'error': 'Invalid token: Token is empty'}
+    return None
+
+def cache_result(digest, token, result):
+    """Cache a verification result under its token digest
+    
+    Args:
+        digest (bytes): Token digest
+        token (str): Verified token, whose exp bounds how long a valid result is kept
+        result (dict): Verification result
+    """
+    if result['valid']:
+        ttl = min(VERIFY_CACHE_TTL, token_expiry(token) - time.time())
+    elif result['error'].startswith('Verification error'):
+        # Database failures say nothing about the token, so they aren't cached
+        return
+    else:
+        ttl = VERIFY_CACHE_NEGATIVE_TTL
+    
+    verify_cache.set(digest, result, ttl=ttl)
+
+def collect_cache_metrics():
+    """Render verification cache size and hit/miss counters for /metrics"""
+    stats = verify_cache.stats()
+    return [
+        "# HELP token_verify_cache_entries Verification results currently cached",
+        "# TYPE token_verify_cache_entries gauge",
+        metrics.format_sample('token_verify_cache_entries', {}, stats['size']),
+        "# HELP token_verify_cache_requests_total Verification cache lookups by result",
+        "# TYPE token_verify_cache_requests_total counter",
+        metrics.format_sample('token_verify_cache_requests_total', {'result': 'hit'}, stats['hits']),
+        metrics.format_sample('token_verify_cache_requests_total', {'result': 'miss'}, stats['misses']),
+        "# HELP token_verify_cache_evictions_total Cached results evicted to stay within VERIFY_CACHE_SIZE",
+        "# TYPE token_verify_cache_evictions_total counter",
+        metrics.format_sample('token_verify_cache_evictions_total', {}, stats['evictions'])
+    ]
+
+metrics.Collector(collect_cache_metrics)
+
+def on_token_revoked(payload):
+    """Drop a token revoked by any worker from verify_cache"""
+    if payload is None:
+        verify_cache.clear()
+    else:
+        verify_cache.invalidate(bytes.fromhex(payload['digest']))
+
+def on_user_change(payload):
+    """Drop cached results when a user is renamed or deleted"""
+    # Results are keyed by token digest, not user, so drop them all
+    verify_cache.clear()
+
+db.change_listener.on_change('tokens', on_token_revoked)
+db.change_listener.on_change('users', on_user_change)
+
+@counted
 def verify_token(token):
-    """Verify a JWT token
+    """Verify a JWT token, answering repeat verifications from verify_cache
+    
+    Args:
+        token (str): JWT token to verify
+        
+    Returns:
+        dict: Result containing validation status and user info if valid
+    """
+    result = check_token_type(token)
+    if result:
+        return result
+    
+    digest = token_digest(token)
+    result = verify_cache.get(digest)
+    if result is MISSING:
+        result = check_token(token)
+        cache_result(digest, token, result)
+    return result
+
+def check_token(token):
+    """Verify a JWT token against its signature and the database, bypassing the cache
     
     Args:
         token (str): JWT token to verify
@@ -26,37 +151,47 @@ def verify_token(token):
     Returns:
         dict: Result containing validation status and user info if valid
     """
+    result = check_token_type(token)
+    if result:
+        return result
+    
     try:
-        # Log what we're trying to verify for debugging
-        logger.info(f"Starting verification for token: {token[:20]}...")
+        # The unverified decode only exists for debugging, so skip it unless it will be logged
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Starting verification for token: %s...", token[:20])
+            try:
+                unverified = jwt.decode(token, options={"verify_signature": False}, algorithms=["HS256"])
+                logger.debug("Token contains payload (unverified): %s", unverified)
+            except Exception as e:
+                logger.debug("Could not decode token without verification: %s", e)
         
-        # Try to decode without verification first to see what's in the token
-        try:
-            unverified = jwt.decode(token, options={"verify_signature": False}, algorithms=["HS256"])
-            logger.info(f"Token contains payload (unverified): {unverified}")
-        except Exception as e:
-            logger.warning(f"Could not decode token without verification: {str(e)}")
+        # Decode and verify token
+        payload = decode_token(token)
         
-        # Decode and verify token - IMPORTANT: disable audience validation
-        payload = jwt.decode(
-            token, 
-            SECRET_KEY, 
-            options={"verify_aud": False},  # This is critical! Disables audience validation
-            algorithms=["HS256"]
-        )
+        if TOKEN_VERIFY_MODE == 'stateless':
+            result = verify_claims(payload)
+            if result:
+                return result
         
         # Check if token exists in database
         token_record = get_token(token)
         if not token_record:
-            logger.warning(f"Token not found in database: {token[:20]}...")
+            logger.warning("Token not found in database: %s...", token[:20])
             return {
                 'valid': False,
                 'error': 'Token not found'
             }
         
+        if token_record['revoked_at']:
+            logger.warning("Token revoked: %s...", token[:20])
+            return {
+                'valid': False,
+                'error': 'Token revoked'
+            }
+        
         # Check token expiration
         if datetime.datetime.utcnow() > token_record['expires_at']:
-            logger.warning(f"Token expired: {token[:20]}...")
+            logger.warning("Token expired: %s...", token[:20])
             return {
                 'valid': False,
                 'error': 'Token expired'
@@ -67,14 +202,15 @@ def verify_token(token):
         user = get_user_by_id_for_verification(user_id)
         
         if not user:
-            logger.warning(f"User not found for token: {token[:20]}...")
+            logger.warning("User not found for token: %s...", token[:20])
             return {
                 'valid': False,
                 'error': 'User not found'
             }
         
         # Return user information
-        logger.info(f"Token verified successfully for user: {user['email']}")
+        logger.info("Token verified successfully for user: %s", user['email'],
+                    extra={'event': 'token_verified'})
         return {
             'valid': True,
             'user': {
@@ -84,23 +220,129 @@ def verify_token(token):
             }
         }
     except jwt.ExpiredSignatureError:
-        logger.warning(f"Token expired (JWT validation): {token[:20]}...")
+        logger.warning("Token expired (JWT validation): %s...", token[:20])
         return {'valid': False, 'error': 'Token expired'}
     except jwt.InvalidTokenError as e:
-        logger.warning(f"Invalid token ({str(e)}): {token[:20]}...")
+        logger.warning("Invalid token (%s): %s...", e, token[:20])
         return {'valid': False, 'error': f'Invalid token: {str(e)}'}
     except Exception as e:
         logger.error(f"Token verification error: {str(e)}")
         return {'valid': False, 'error': f'Verification error: {str(e)}'}
 
+def decode_token(token):
+    """Decode a JWT token and check its signature and expiry
+    
+    Audience validation is disabled: tokens are accepted from any relying service.
+    
+    Raises:
+        jwt.InvalidTokenError: If the token is malformed, forged or expired
+    """
+    started = time.perf_counter()
+    try:
+        return keyring.decode(token)
+    finally:
+        metrics.JWT_DURATION.observe(time.perf_counter() - started, operation='decode')
+
+def check_token_record(record):
+    """Turn a token record joined with its user into a verification result
+    
+    Args:
+        record (dict): Token expires_at, revoked_at and user, or None if the token wasn't found
+        
+    Returns:
+        dict: Result containing validation status and user info if valid
+    """
+    if not record:
+        return {'valid': False, 'error': 'Token not found'}
+    
+    if record['revoked_at']:
+        return {'valid': False, 'error': 'Token revoked'}
+    
+    if datetime.datetime.utcnow() > record['expires_at']:
+        return {'valid': False, 'error': 'Token expired'}
+    
+    if not record['user']:
+        return {'valid': False, 'error': 'User not found'}
+    
+    return {'valid': True, 'user': record['user']}
+
+def verify_tokens(tokens):
+    """Verify a batch of JWT tokens
+    
+    Cached results are used where there are any. The remaining signatures are
+    checked one by one, then every token that passed is resolved together
+    with its user in a single query.
+    
+    Args:
+        tokens (list): JWT tokens to verify
+        
+    Returns:
+        list: One result dict per token, in input order, shaped like verify_token's result
+    """
+    results = [None] * len(tokens)
+    pending = {}
+    
+    for index, token in enumerate(tokens):
+        results[index] = check_token_type(token)
+        if results[index]:
+            continue
+        
+        digest = token_digest(token)
+        cached = verify_cache.get(digest)
+        if cached is not MISSING:
+            results[index] = cached
+            continue
+        
+        try:
+            payload = decode_token(token)
+        except jwt.ExpiredSignatureError:
+            results[index] = {'valid': False, 'error': 'Token expired'}
+        except jwt.InvalidTokenError as e:
+            results[index] = {'valid': False, 'error': f'Invalid token: {str(e)}'}
+        else:
+            if TOKEN_VERIFY_MODE == 'stateless':
+                results[index] = verify_claims(payload)
+            
+            if not results[index]:
+                pending.setdefault(token, []).append(index)
+                continue
+        
+        cache_result(digest, token, results[index])
+    
+    if pending:
+        records = None
+        error = None
+        try:
+            records = get_tokens_with_users(list(pending))
+        except Exception as e:
+            error = str(e)
+            logger.error(f"Batch token verification error: {error}")
+        
+        for token, indexes in pending.items():
+            if records is None:
+                result = {'valid': False, 'error': f'Verification error: {error}'}
+            else:
+                result = check_token_record(records.get(token))
+            
+            cache_result(token_digest(token), token, result)
+            for index in indexes:
+                results[index] = result
+    
+    for result in results:
+        metrics.VERIFICATIONS.inc(outcome=outcome_label(result))
+    
+    valid_count = sum(1 for result in results if result['valid'])
+    logger.info("Batch verification: %s/%s tokens valid", valid_count, len(tokens))
+    return results
+
 def get_token(token_value):
     """Get token by value"""
     query = """
-    SELECT id, user_id, created_at, expires_at, issued_for
+    SELECT id, user_id, created_at, expires_at, issued_for, revoked_at
     FROM tokens
-    WHERE token_value = %s
+    WHERE token_digest = %s AND expires_at > %s
     """
-    row = db.execute_query(query, (token_value,), fetchone=True)
+    row = db.execute_query(query, (token_digest(token_value), datetime.datetime.utcnow()), fetchone=True)
     
     if row:
         return {
@@ -108,10 +350,70 @@ def get_token(token_value):
             'user_id': row[1],
             'created_at': row[2],
             'expires_at': row[3],
-            'issued_for': row[4]
+            'issued_for': row[4],
+            'revoked_at': row[5]
         }
     return None
 
+def verify_claims(payload):
+    """Verify a decoded token from its claims alone, for stateless mode
+    
+    Args:
+        payload (dict): Claims of a token whose signature and expiry were already checked
+        
+    Returns:
+        dict: Verification result, or None if the token needs a database lookup
+            (no jti, no embedded user claims, or the denylist hasn't synced yet)
+    """
+    jti = payload.get('jti')
+    if not jti or not denylist.ready:
+        return None
+    
+    if denylist.is_revoked(jti):
+        logger.warning("Token revoked: %s", jti)
+        return {'valid': False, 'error': 'Token revoked'}
+    
+    if 'username' not in payload or 'email' not in payload:
+        return None
+    
+    return {
+        'valid': True,
+        'user': {
+            'id': int(payload['sub']),
+            'username': payload['username'],
+            'email': payload['email']
+        }
+    }
+
+def get_tokens_with_users(token_values):
+    """Get token records and their users for many token values in one query
+    
+    Returns:
+        dict: Mapping of token value to its expiry and user information
+    """
+    digests = {token_digest(token_value): token_value for token_value in token_values}
+    
+    query = """
+    SELECT t.token_digest, t.expires_at, t.revoked_at, u.id, u.username, u.email
+    FROM tokens t
+    LEFT JOIN users u ON u.id = t.user_id
+    WHERE t.token_digest = ANY(%s) AND t.expires_at > %s
+    """
+    rows = db.execute_query(query, (list(digests), datetime.datetime.utcnow()), fetchall=True)
+    
+    return {
+        digests[bytes(row[0])]: {
+            'expires_at': row[1],
+            'revoked_at': row[2],
+            'user': {
+                'id': row[3],
+                'username': row[4],
+                'email': row[5]
+            } if row[3] is not None else None
+        }
+        for row in rows or []
+    }
+
 # Add this function directly in verifytoken.py to avoid circular imports
 def get_user_by_id_for_verification(user_id):
     """Get basic user information by ID for token verification"""
@@ -0,0 +1,228 @@
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+import platform
+import datetime
+import subprocess
+from pathlib import Path
+
+# Add the project directory to Python path
+project_dir = Path(__file__).parent.parent
+if str(project_dir) not in sys.path:
+    sys.path.insert(0, str(project_dir))
+
+BENCHMARKS_DIR = Path(__file__).parent
+DEFAULT_OUTPUT = BENCHMARKS_DIR / 'results' / 'latest.json'
+DEFAULT_BASELINE = BENCHMARKS_DIR / 'baseline.json'
+
+# Benchmarks run against their own throwaway database, never the configured one:
+# an SQLite file by default, so no database server is needed, or a local Postgres
+# database with BENCH_DB_BACKEND=postgres. Throttling is off so repeated logins
+# aren't rejected, and logging is quiet so it doesn't dominate the timings.
+os.environ['DB_BACKEND'] = os.environ.get('BENCH_DB_BACKEND', 'sqlite')
+os.environ['DB_SQLITE_PATH'] = str(BENCHMARKS_DIR / 'results' / 'bench.db')
+os.environ['DB_NAME'] = os.environ.get('BENCH_DB_NAME', 'auth_bench')
+os.environ.setdefault('THROTTLE_ENABLED', 'False')
+os.environ.setdefault('LOG_LEVEL', 'ERROR')
+os.environ.setdefault('DB_SLOW_QUERY_MS', '0')
+
+import jwt
+import psycopg2
+from backend import db
+from backend.login import login_user
+from backend.signup import signup_user
+from backend.gentoken import generate_token
+from backend.keys import keyring
+from backend.verifytoken import verify_token, check_token
+
+# Imported through sys.modules: `backend.app` is shadowed by the Flask object
+import backend.app  # noqa: F401
+app_module = sys.modules['backend.app']
+
+PASSWORD = 'benchmark-password'
+API_KEY = 'benchmark-api-key'
+
+def create_database():
+    """Create the benchmark database if it doesn't exist yet"""
+    conn = psycopg2.connect(host=db.DB_HOST, port=db.DB_PORT, dbname='postgres',
+                            user=db.DB_USER, password=db.DB_PASSWORD)
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_database WHERE datname = %s", (db.DB_NAME,))
+            if not cursor.fetchone():
+                cursor.execute(f'CREATE DATABASE "{db.DB_NAME}"')
+    finally:
+        conn.close()
+
+def setup():
+    """Create a benchmark user and service, and return the fixtures the benchmarks use"""
+    if db.storage.name == 'postgres':
+        create_database()
+    if not db.init_db(migrate=True):
+        raise SystemExit(f"Could not initialize benchmark database {db.DB_NAME}")
+    
+    email = f"bench-{uuid.uuid4().hex[:8]}@example.com"
+    result = signup_user('bench', email, PASSWORD)
+    if not result['success']:
+        raise SystemExit(f"Could not create benchmark user: {result['error']}")
+    user_id = result['user']['id']
+    
+    db.execute_query("""
+    INSERT INTO registered_services (name, domain, client_id, client_secret)
+    VALUES ('benchmark', 'bench.local', 'benchmark', %s)
+    ON CONFLICT (domain) DO UPDATE SET client_secret = EXCLUDED.client_secret, is_active = TRUE
+    """, (API_KEY,), commit=True)
+    
+    now = datetime.datetime.utcnow()
+    claims = {'sub': str(user_id), 'iat': now, 'jti': str(uuid.uuid4())}
+    
+    return {
+        'email': email,
+        'user_id': user_id,
+        'valid_token': generate_token(user_id, 'bench.local'),
+        'expired_token': keyring.sign(dict(claims, exp=now - datetime.timedelta(hours=1))),
+        'forged_token': jwt.encode(dict(claims, exp=now + datetime.timedelta(hours=1)), 'not-the-secret', algorithm='HS256'),
+        # Correctly signed but never stored, so it always needs a database lookup
+        'unknown_token': keyring.sign(dict(claims, exp=now + datetime.timedelta(hours=1)))
+    }
+
+def check_api_auth():
+    with app_module.app.test_request_context(headers={'X-API-Key': API_KEY}):
+        return app_module.check_api_auth()
+
+def get_benchmarks(fixtures):
+    """Get (name, function, iterations) for every benchmark
+    
+    bcrypt-bound operations get far fewer iterations than the rest.
+    """
+    signups = iter(range(10 ** 9))
+    
+    return [
+        ('generate_token', lambda: generate_token(fixtures['user_id'], 'bench.local'), 2000),
+        ('verify_token.valid', lambda: verify_token(fixtures['valid_token']), 5000),
+        ('verify_token.expired', lambda: verify_token(fixtures['expired_token']), 5000),
+        ('verify_token.forged', lambda: verify_token(fixtures['forged_token']), 5000),
+        ('verify_token.unknown', lambda: verify_token(fixtures['unknown_token']), 5000),
+        # The same checks without the verification result cache, i.e. a cache miss
+        ('check_token.valid', lambda: check_token(fixtures['valid_token']), 5000),
+        ('check_token.expired', lambda: check_token(fixtures['expired_token']), 5000),
+        ('check_token.forged', lambda: check_token(fixtures['forged_token']), 5000),
+        ('check_token.unknown', lambda: check_token(fixtures['unknown_token']), 5000),
+        ('login_user', lambda: login_user(fixtures['email'], PASSWORD), 30),
+        ('signup_user', lambda: signup_user('bench', f"{uuid.uuid4().hex[:8]}-{next(signups)}@example.com", PASSWORD), 30),
+        ('check_api_auth', check_api_auth, 20000)
+    ]
+
+def measure(function, iterations, warmup):
+    """Time a function call by call
+    
+    Returns:
+        dict: Iterations, ops/sec and p50/p99 latency in milliseconds
+    """
+    for _ in range(warmup):
+        function()
+    
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    
+    timings.sort()
+    return {
+        'iterations': iterations,
+        'ops_per_sec': round(iterations / sum(timings), 1),
+        'p50_ms': round(timings[int(iterations * 0.5)] * 1000, 4),
+        'p99_ms': round(timings[min(iterations - 1, int(iterations * 0.99))] * 1000, 4)
+    }
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=project_dir,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results, baseline, threshold):
+    """Compare results against a baseline
+    
+    Returns:
+        list: Names of benchmarks whose throughput dropped or p99 grew by more than threshold
+    """
+    regressions = []
+    print(f"\n{'benchmark':<24}{'ops/sec':>12}{'baseline':>12}{'change':>9}{'p99 ms':>11}{'baseline':>11}")
+    
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            print(f"{name:<24}{result['ops_per_sec']:>12}{'-':>12}")
+            continue
+        
+        change = result['ops_per_sec'] / base['ops_per_sec'] - 1
+        regressed = change < -threshold or result['p99_ms'] > base['p99_ms'] * (1 + threshold)
+        if regressed:
+            regressions.append(name)
+        
+        print(f"{name:<24}{result['ops_per_sec']:>12}{base['ops_per_sec']:>12}{change:>+9.0%}"
+              f"{result['p99_ms']:>11}{base['p99_ms']:>11}{'  REGRESSION' if regressed else ''}")
+    
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Crafteri Auth primitives")
+    parser.add_argument('--only', nargs='*', help="Run only benchmarks whose name starts with one of these")
+    parser.add_argument('--scale', type=float, default=1.0, help="Multiply every iteration count")
+    parser.add_argument('--output', type=Path, default=DEFAULT_OUTPUT, help="Where to write the JSON results")
+    parser.add_argument('--baseline', type=Path, default=DEFAULT_BASELINE, help="Results to compare against")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="Relative slowdown reported as a regression (default: 0.2)")
+    parser.add_argument('--save-baseline', action='store_true', help="Also write the results as the new baseline")
+    args = parser.parse_args()
+    
+    fixtures = setup()
+    
+    results = {}
+    for name, function, iterations in get_benchmarks(fixtures):
+        if args.only and not any(name.startswith(prefix) for prefix in args.only):
+            continue
+        iterations = max(1, int(iterations * args.scale))
+        results[name] = measure(function, iterations, warmup=max(1, iterations // 10))
+        print(f"{name:<24}{results[name]['ops_per_sec']:>12} ops/sec  "
+              f"p50 {results[name]['p50_ms']} ms  p99 {results[name]['p99_ms']} ms")
+    
+    report = {
+        'created_at': datetime.datetime.utcnow().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'database': f"postgres:{db.DB_NAME}" if db.storage.name == 'postgres' else 'sqlite',
+        'results': results
+    }
+    
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(report, indent=2) + '\n')
+    print(f"\nResults written to {args.output}")
+    
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(report, indent=2) + '\n')
+        print(f"Baseline written to {args.baseline}")
+        return 0
+    
+    if not args.baseline.exists():
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+        return 0
+    
+    baseline = json.loads(args.baseline.read_text())
+    regressions = compare(results, baseline['results'], args.threshold)
+    
+    if regressions:
+        print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,5 @@
+"""Client SDK for services that authenticate users with Crafteri Auth"""
+
+from .client import AuthClient
+
+__all__ = ['AuthClient']
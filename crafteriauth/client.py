@@ -0,0 +1,307 @@
+import json
+import time
+import base64
+import logging
+import threading
+from collections import OrderedDict
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Configure logging
+logger = logging.getLogger('crafteriauth.client')
+
+def token_expiry(token):
+    """Read a token's exp claim without verifying it, or None if it can't be read"""
+    try:
+        payload = token.split('.')[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))
+        return float(claims['exp'])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return None
+
+class ResultCache:
+    """Thread-safe LRU cache of verification results with per-entry expiry
+    
+    Args:
+        maxsize (int): Maximum number of tokens kept
+    """
+    
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()  # token -> (result, expires_at)
+        self._lock = threading.Lock()
+    
+    def get(self, token):
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            if entry[1] <= time.time():
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return entry[0]
+    
+    def set(self, token, result, expires_at):
+        with self._lock:
+            self._entries[token] = (result, expires_at)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+    
+    def invalidate(self, token):
+        with self._lock:
+            self._entries.pop(token, None)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+def complete_results(results, count):
+    """Pad or trim a batch response's results to one per token
+    
+    Tokens the server returned no result for get a failed result rather than
+    being dropped, so no caller waits for or looks up a result that never comes.
+    """
+    results = list(results) if isinstance(results, list) else []
+    if len(results) != count:
+        logger.error(f"Batch verification returned {len(results)} result(s) for {count} token(s)")
+    missing = {'valid': False, 'error': 'Verification failed: incomplete response'}
+    return results[:count] + [missing] * (count - len(results))
+
+class VerificationBatcher:
+    """Combines concurrent verifications into calls to /api/verify-tokens
+    
+    A single sender thread takes up to max_batch queued tokens, waiting at
+    most max_wait seconds after the first one arrives, and verifies them
+    with one request. Each caller is released when its result arrives, or
+    after timeout seconds if it never does.
+    """
+    
+    def __init__(self, send, max_batch=100, max_wait=0.005, timeout=30):
+        self.send = send
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.timeout = timeout
+        self._queue = []
+        self._cond = threading.Condition()
+        self._thread = None
+    
+    def submit(self, token):
+        """Queue a token and wait for its verification result"""
+        entry = {'token': token, 'done': threading.Event(), 'result': None}
+        
+        with self._cond:
+            self._queue.append(entry)
+            
+            # Started lazily so forked workers each get their own thread
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='crafteriauth-batch', daemon=True)
+                self._thread.start()
+            
+            self._cond.notify()
+        
+        if not entry['done'].wait(self.timeout):
+            return {'valid': False, 'error': 'Verification failed: timed out waiting for the batch request'}
+        return entry['result']
+    
+    def _take_batch(self):
+        with self._cond:
+            while not self._queue:
+                self._cond.wait()
+            
+            # Give concurrent callers a short window to join the batch
+            deadline = time.monotonic() + self.max_wait
+            while len(self._queue) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            
+            batch, self._queue = self._queue[:self.max_batch], self._queue[self.max_batch:]
+            return batch
+    
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            
+            try:
+                results = self.send([entry['token'] for entry in batch])
+            except Exception as e:
+                results = [{'valid': False, 'error': f'Verification failed: {str(e)}'}] * len(batch)
+            
+            # Every caller must be released, even if send returned too few results
+            results = complete_results(results, len(batch))
+            for entry, result in zip(batch, results):
+                entry['result'] = result
+                entry['done'].set()
+
+class AuthClient:
+    """Client for the Crafteri Auth token API
+    
+    Keeps a pool of keep-alive connections to the auth service, retries
+    connection errors and 502/503/504 responses with backoff, and caches
+    verification results. A valid result is cached for at most cache_ttl
+    seconds and never past the token's exp; an invalid one for negative_ttl.
+    
+    Args:
+        base_url (str): Auth service URL, e.g. "https://auth.example.com"
+        api_key (str): Your service's API key
+        timeout (float or tuple): Seconds to wait, or (connect, read) timeouts
+        retries (int): Retries after a failed request
+        backoff (float): Backoff factor between retries, in seconds
+        pool_size (int): Keep-alive connections kept open to the auth service
+        cache_ttl (float): Longest a valid result is reused; 0 disables caching
+        negative_ttl (float): How long an invalid result is reused
+        cache_size (int): Maximum number of cached results
+        batch (bool): Combine concurrent verify_token calls into batch requests
+        batch_max (int): Maximum tokens per batch request (at most the server's VERIFY_BATCH_MAX_TOKENS)
+        batch_wait (float): Seconds to wait for concurrent calls to join a batch
+    """
+    
+    def __init__(self, base_url, api_key, timeout=(3.05, 5), retries=2, backoff=0.1, pool_size=10,
+                 cache_ttl=30, negative_ttl=5, cache_size=10000, batch=False, batch_max=100, batch_wait=0.005):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.cache_ttl = cache_ttl
+        self.negative_ttl = negative_ttl
+        self.cache = ResultCache(cache_size)
+        
+        # A batched call waits for at most two requests: the one in flight and its own
+        request_time = sum(timeout) if isinstance(timeout, tuple) else timeout
+        batch_timeout = 2 * (request_time * (retries + 1) + backoff * 2 ** retries) + batch_wait
+        self.batcher = VerificationBatcher(self._send_batch, batch_max, batch_wait, batch_timeout) if batch else None
+        
+        # Every endpoint used here is safe to repeat, so POSTs are retried too
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset({'GET', 'POST'}),
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers['X-API-Key'] = api_key
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+    
+    def close(self):
+        """Close the pooled connections"""
+        self.session.close()
+    
+    def verify_token(self, token):
+        """Verify a token, using a cached result when there is one
+        
+        Returns:
+            dict: {'valid': True, 'user': {...}} or {'valid': False, 'error': '...'}
+        """
+        result = self.cache.get(token) if self.cache_ttl else None
+        if result is not None:
+            return result
+        
+        if self.batcher:
+            return self.batcher.submit(token)
+        
+        try:
+            response = self._post('/api/verify-token', {'token': token})
+        except requests.RequestException as e:
+            logger.error(f"Token verification request failed: {str(e)}")
+            return {'valid': False, 'error': f'Verification failed: {str(e)}'}
+        
+        body = self._json(response)
+        if 'valid' not in body:
+            return {'valid': False, 'error': body.get('error') or f'Verification failed: HTTP {response.status_code}'}
+        
+        result = {'valid': True, 'user': body['user']} if body['valid'] else {'valid': False, 'error': body.get('error')}
+        self._remember(token, result)
+        return result
+    
+    def verify_tokens(self, tokens):
+        """Verify many tokens, sending only the uncached ones in batch requests
+        
+        Returns:
+            list: One result per token, in input order, shaped like verify_token's result
+        """
+        results = [self.cache.get(token) if self.cache_ttl else None for token in tokens]
+        missing = list(dict.fromkeys(token for token, result in zip(tokens, results) if result is None))
+        
+        fetched = {}
+        batch_max = self.batcher.max_batch if self.batcher else 100
+        for start in range(0, len(missing), batch_max):
+            chunk = missing[start:start + batch_max]
+            try:
+                fetched.update(zip(chunk, self._send_batch(chunk)))
+            except requests.RequestException as e:
+                logger.error(f"Batch verification request failed: {str(e)}")
+                fetched.update((token, {'valid': False, 'error': f'Verification failed: {str(e)}'}) for token in chunk)
+        
+        return [result if result is not None else fetched[token] for token, result in zip(tokens, results)]
+    
+    def revoke_token(self, token):
+        """Revoke a token, e.g. when the user logs out of your service
+        
+        Returns:
+            dict: Result containing success status and error message if unsuccessful
+        """
+        self.cache.invalidate(token)
+        
+        try:
+            response = self._post('/api/revoke-token', {'token': token})
+        except requests.RequestException as e:
+            logger.error(f"Token revocation request failed: {str(e)}")
+            return {'success': False, 'error': f'Revocation failed: {str(e)}'}
+        
+        body = self._json(response)
+        if response.status_code == 200:
+            self.cache.set(token, {'valid': False, 'error': 'Token revoked'}, time.time() + self.negative_ttl)
+            return {'success': True}
+        return {'success': False, 'error': body.get('error') or f'Revocation failed: HTTP {response.status_code}'}
+    
+    def _send_batch(self, tokens):
+        """Verify tokens with one /api/verify-tokens request and cache the results"""
+        response = self._post('/api/verify-tokens', {'tokens': tokens})
+        body = self._json(response)
+        
+        if 'results' not in body:
+            error = body.get('error') or f'Verification failed: HTTP {response.status_code}'
+            return [{'valid': False, 'error': error}] * len(tokens)
+        
+        received = body['results'] if isinstance(body['results'], list) else []
+        results = complete_results(received, len(tokens))
+        # Only results the server actually sent are cached
+        for token, result in zip(tokens, received):
+            self._remember(token, result)
+        return results
+    
+    def _post(self, path, payload):
+        return self.session.post(f"{self.base_url}{path}", json=payload, timeout=self.timeout)
+    
+    def _json(self, response):
+        try:
+            body = response.json()
+        except ValueError:
+            return {}
+        return body if isinstance(body, dict) else {}
+    
+    def _remember(self, token, result):
+        # Server-side failures say nothing about the token, so they aren't cached
+        if not self.cache_ttl or result.get('error', '').startswith('Verification error'):
+            return
+        
+        now = time.time()
+        if result['valid']:
+            expires_at = min(now + self.cache_ttl, token_expiry(token) or now)
+        else:
+            expires_at = now + self.negative_ttl
+        
+        if expires_at > now:
+            self.cache.set(token, result, expires_at)
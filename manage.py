@@ -0,0 +1,121 @@
+import sys
+import argparse
+from pathlib import Path
+
+# Add the project directory to Python path
+project_dir = Path(__file__).parent
+if str(project_dir) not in sys.path:
+    sys.path.insert(0, str(project_dir))
+
+from backend import db, assets, importusers
+from backend.app import set_service_active
+
+def migrate(args):
+    """Apply pending schema migrations"""
+    if not db.init_db(migrate=False):
+        return 1
+    
+    applied = db.apply_migrations()
+    if applied:
+        print(f"Applied migrations: {', '.join(str(version) for version in applied)}")
+    else:
+        print("Database schema is up to date")
+    return 0
+
+def migration_status(args):
+    """Show which migrations have been applied"""
+    if not db.init_db(migrate=False):
+        return 1
+    
+    for migration in db.migration_status():
+        state = 'applied' if migration['applied'] else 'pending'
+        print(f"{migration['version']:04d}  {migration['name']:<50} {state}")
+    return 0
+
+def maintain_tokens(args):
+    """Pre-create upcoming tokens partitions and drop fully expired ones"""
+    if not db.init_db(migrate=False):
+        return 1
+    
+    # SQLite (and an unmigrated Postgres) has a plain tokens table
+    if not db.tokens_partitioned():
+        deleted = db.delete_expired_tokens(args.retain_days)
+        print(f"Deleted {deleted} expired token(s)")
+        return 0
+    
+    created = db.create_token_partitions(args.days_ahead)
+    dropped = db.drop_expired_token_partitions(args.retain_days)
+    print(f"Created {len(created)} partition(s), dropped {len(dropped)} partition(s)")
+    return 0
+
+def build_assets(args):
+    """Fingerprint and precompress the static assets"""
+    entries = assets.build_assets()
+    print(f"Built {len(entries)} asset(s) into {assets.ASSETS_BUILD_DIR}")
+    if not assets.brotli:
+        print("brotli is not installed, only gzip variants were written")
+    return 0
+
+def import_users(args):
+    """Import users from a CSV or NDJSON file"""
+    if not db.init_db(migrate=False):
+        return 1
+    
+    report = args.report or args.path.with_name(f"{args.path.name}.rejected.csv")
+    counts = importusers.import_users(args.path, report, args.format, args.batch_size, args.workers)
+    print(f"Read {counts['read']} row(s): imported {counts['imported']}, rejected {counts['rejected']}")
+    if counts['rejected']:
+        print(f"Rejected rows written to {report}")
+    return 0
+
+def activate_service(args):
+    """Activate or deactivate a registered service"""
+    if not db.init_db(migrate=False):
+        return 1
+    
+    if not set_service_active(args.service_id, args.active):
+        print(f"No service with id {args.service_id}")
+        return 1
+    print(f"Service {args.service_id} {'activated' if args.active else 'deactivated'}")
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(description="Crafteri Auth management commands")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    subparsers.add_parser('migrate', help="Apply pending schema migrations").set_defaults(func=migrate)
+    subparsers.add_parser('migration-status', help="List applied and pending migrations").set_defaults(func=migration_status)
+    
+    maintain_parser = subparsers.add_parser('maintain-tokens', help="Rotate the daily tokens partitions (run daily)")
+    maintain_parser.add_argument('--days-ahead', type=int, default=db.TOKEN_PARTITION_DAYS_AHEAD,
+                                 help="Days of future partitions to keep ready")
+    maintain_parser.add_argument('--retain-days', type=int, default=db.TOKEN_PARTITION_RETAIN_DAYS,
+                                 help="Days to keep partitions after their tokens expired")
+    maintain_parser.set_defaults(func=maintain_tokens)
+    
+    subparsers.add_parser('build-assets', help="Fingerprint and precompress static files (run on deploy)").set_defaults(func=build_assets)
+    
+    import_parser = subparsers.add_parser('import-users', help="Bulk import users from CSV or NDJSON")
+    import_parser.add_argument('path', type=Path,
+                               help="File with email, username and password (plaintext) or password_hash (bcrypt) fields")
+    import_parser.add_argument('--format', choices=('csv', 'ndjson'), help="Input format (default: from the file suffix)")
+    import_parser.add_argument('--report', type=Path, help="Where to write rejected rows (default: <path>.rejected.csv)")
+    import_parser.add_argument('--batch-size', type=int, default=importusers.IMPORT_BATCH_SIZE,
+                               help="Rows hashed and loaded per transaction")
+    import_parser.add_argument('--workers', type=int, default=importusers.PASSWORD_HASH_WORKERS,
+                               help="Processes hashing plaintext passwords")
+    import_parser.set_defaults(func=import_users)
+    
+    activate_parser = subparsers.add_parser('activate-service', help="Accept API calls made with a service's key")
+    activate_parser.add_argument('service_id', type=int, help="Service id in registered_services")
+    activate_parser.set_defaults(func=activate_service, active=True)
+    
+    deactivate_parser = subparsers.add_parser('deactivate-service', help="Reject API calls made with a service's key")
+    deactivate_parser.add_argument('service_id', type=int, help="Service id in registered_services")
+    deactivate_parser.set_defaults(func=activate_service, active=False)
+    
+    args = parser.parse_args()
+    return args.func(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
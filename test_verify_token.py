@@ -1,6 +1,6 @@
-import requests
 import json
 import sys
+from crafteriauth import AuthClient
 
 # Configuration - replace with your actual values
 AUTH_SERVICE_URL = "http://localhost:5000"  # Change to your actual auth service URL
@@ -15,41 +15,10 @@ def verify_token(token):
         token (str): The token to verify
         
     Returns:
-        dict: The response from the authentication service
+        dict: {'valid': True, 'user': {...}} or {'valid': False, 'error': '...'}
     """
-    endpoint = f"{AUTH_SERVICE_URL}/api/verify-token"
-    
-    headers = {
-        "Content-Type": "application/json",
-        "X-API-Key": API_KEY
-    }
-    
-    payload = {
-        "token": token
-    }
-    
-    try:
-        # Send POST request to the verify-token endpoint
-        response = requests.post(endpoint, headers=headers, json=payload)
-        
-        # Check if request was successful
-        if response.status_code == 200:
-            return {
-                "success": True,
-                "data": response.json()
-            }
-        else:
-            return {
-                "success": False,
-                "status_code": response.status_code,
-                "error": response.text
-            }
-            
-    except requests.exceptions.RequestException as e:
-        return {
-            "success": False,
-            "error": f"Request failed: {str(e)}"
-        }
+    with AuthClient(AUTH_SERVICE_URL, API_KEY) as client:
+        return client.verify_token(token)
 
 if __name__ == "__main__":
     # Use command line argument as token if provided
@@ -60,12 +29,10 @@ if __name__ == "__main__":
     
     result = verify_token(TOKEN_TO_VERIFY)
     
-    if result["success"]:
+    if result["valid"]:
         print("\n[SUCCESS] Token verification successful!")
         print("\nUser information:")
-        print(json.dumps(result["data"]["user"], indent=4))
+        print(json.dumps(result["user"], indent=4))
     else:
         print("\n[FAILED] Token verification failed!")
         print(f"Error: {result.get('error', 'Unknown error')}")
-        if "status_code" in result:
-            print(f"Status code: {result['status_code']}")
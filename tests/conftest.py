@@ -0,0 +1,21 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# The backend reads its configuration when it is first imported, so the test
+# settings are put in place here, before any test module imports it: a throwaway
+# SQLite database (never the configured Postgres one), cheap bcrypt hashes, no
+# login throttling and no background last_login writes.
+os.environ['DB_BACKEND'] = 'sqlite'
+os.environ['DB_SQLITE_PATH'] = str(Path(tempfile.mkdtemp(prefix='crafteriauth-tests-')) / 'auth.db')
+os.environ['BCRYPT_ROUNDS'] = '4'
+os.environ['PASSWORD_HASH_WORKERS'] = '1'
+os.environ['THROTTLE_ENABLED'] = 'False'
+os.environ['LAST_LOGIN_WRITE_BEHIND'] = 'False'
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+# Make the backend package importable when pytest is run from the tests directory
+project_root = Path(__file__).parent.parent
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
@@ -0,0 +1,12 @@
+import asyncio
+from backend import metrics
+from backend.asyncverify import verify_token_async
+
+def test_async_verifications_are_counted():
+    key = ('invalid_token',)
+    before = metrics.VERIFICATIONS._values.get(key, 0)
+    
+    result = asyncio.run(verify_token_async(5))
+    
+    assert result == {'valid': False, 'error': 'Invalid token: Token must be a string'}
+    assert metrics.VERIFICATIONS._values.get(key, 0) == before + 1
@@ -0,0 +1,52 @@
+import threading
+from crafteriauth import AuthClient
+from crafteriauth.client import VerificationBatcher
+
+INCOMPLETE = {'valid': False, 'error': 'Verification failed: incomplete response'}
+
+class FakeResponse:
+    status_code = 200
+    
+    def __init__(self, body):
+        self.body = body
+    
+    def json(self):
+        return self.body
+
+def short_client(**kwargs):
+    """A client whose batch endpoint answers only the first token"""
+    client = AuthClient('http://auth.test', 'key', **kwargs)
+    client._post = lambda path, payload: FakeResponse({'results': [{'valid': False, 'error': 'Token expired'}]})
+    return client
+
+def test_verify_tokens_fills_missing_results():
+    client = short_client()
+    results = client.verify_tokens(['a', 'b', 'c'])
+    assert results == [{'valid': False, 'error': 'Token expired'}, INCOMPLETE, INCOMPLETE]
+    
+    # Padded results aren't cached, so the next call asks the server again
+    assert client.cache.get('b') is None
+
+def test_batched_callers_released_on_short_response():
+    client = short_client(batch=True, batch_wait=0.2)
+    results = {}
+    
+    def verify(token):
+        results[token] = client.verify_token(token)
+    
+    threads = [threading.Thread(target=verify, args=(token,)) for token in ('a', 'b', 'c')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+    
+    assert not any(thread.is_alive() for thread in threads)
+    assert sorted(result['error'] for result in results.values()) == [
+        'Token expired', INCOMPLETE['error'], INCOMPLETE['error']
+    ]
+
+def test_batcher_wait_times_out():
+    batcher = VerificationBatcher(lambda tokens: threading.Event().wait(), timeout=0.1)
+    result = batcher.submit('a')
+    assert result['valid'] is False
+    assert 'timed out' in result['error']
@@ -0,0 +1,16 @@
+from backend import db
+
+def test_partition_ddl_shares_one_label():
+    labels = {
+        db.statement_label(f"""
+        CREATE TABLE IF NOT EXISTS tokens_p202610{day:02d} PARTITION OF tokens
+        FOR VALUES FROM ('2026-10-{day:02d}') TO ('2026-10-{day + 1:02d}')
+        """)
+        for day in range(1, 20)
+    }
+    assert labels == {"CREATE TABLE IF NOT EXISTS tokens_p? PARTITION OF tokens FOR VALUES FROM (?) TO (?)"}
+
+def test_label_keeps_placeholders_and_names():
+    assert db.statement_label("SELECT id FROM users\n    WHERE email = %s LIMIT 1") == \
+        "SELECT id FROM users WHERE email = %s LIMIT ?"
+    assert db.statement_label("SELECT sha256(token) FROM tokens") == "SELECT sha256(token) FROM tokens"
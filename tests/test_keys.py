@@ -0,0 +1,34 @@
+import time
+import datetime
+import jwt
+import pytest
+from backend import keys
+
+@pytest.mark.parametrize('value', [
+    '2026-11-01T00:00',
+    '2026-11-01T00:00:00+00:00',
+    '2026-11-01T00:00:00Z',
+    '2026-11-01T02:00:00+02:00'
+])
+def test_parse_cutoff_gives_naive_utc(value):
+    assert keys.parse_cutoff(value) == datetime.datetime(2026, 11, 1)
+
+def test_parse_cutoff_empty():
+    assert keys.parse_cutoff('') is None
+
+@pytest.mark.parametrize('cutoff, accepted', [
+    ('2999-01-01T00:00:00Z', True),
+    ('2999-01-01T00:00:00+00:00', True),
+    ('2000-01-01T00:00:00Z', False),
+    ('', False)
+])
+def test_legacy_hs256_cutoff(tmp_path, monkeypatch, cutoff, accepted):
+    monkeypatch.setattr(keys, 'LEGACY_HS256_UNTIL', keys.parse_cutoff(cutoff))
+    keyring = keys.KeyRing('EdDSA', tmp_path / 'signing_key.pem')
+    token = jwt.encode({'sub': '1', 'exp': time.time() + 60}, keys.SECRET_KEY, algorithm='HS256')
+    
+    if accepted:
+        assert keyring.decode(token)['sub'] == '1'
+    else:
+        with pytest.raises(jwt.InvalidTokenError):
+            keyring.decode(token)
@@ -0,0 +1,21 @@
+import datetime
+from backend import revoketoken
+
+def test_notification_adds_to_denylist(monkeypatch):
+    denylist = revoketoken.RevocationDenylist()
+    denylist._synced_until = datetime.datetime.utcnow()
+    monkeypatch.setattr(revoketoken, 'denylist', denylist)
+    
+    # Payload as sent by notify_auth_change (migration 0010)
+    revoketoken.on_token_revoked({'table': 'tokens', 'digest': '00' * 32, 'jti': 'abc', 'expires_at': 1792352098.25})
+    
+    assert denylist.is_revoked('abc')
+    assert denylist._entries['abc'] == datetime.datetime(2026, 10, 18, 19, 34, 58, 250000)
+
+def test_notification_ignored_before_first_sync(monkeypatch):
+    denylist = revoketoken.RevocationDenylist()
+    monkeypatch.setattr(revoketoken, 'denylist', denylist)
+    
+    revoketoken.on_token_revoked({'table': 'tokens', 'digest': '00' * 32, 'jti': 'abc', 'expires_at': 1792352098.25})
+    
+    assert not denylist.is_revoked('abc')
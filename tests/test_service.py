@@ -1,7 +1,7 @@
 import os
 import uuid
 import datetime
-import requests
+import sys
 import logging
 from flask import Flask, request, render_template, redirect, url_for, jsonify, make_response
 from pathlib import Path
@@ -18,11 +18,19 @@ project_root = Path(__file__).parent.parent
 env_path = project_root / '.env'
 load_dotenv(dotenv_path=env_path)
 
+# Use the client SDK from this repository
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+from crafteriauth import AuthClient
+
 # Configuration
 CRAFTERI_AUTH_URL = "http://localhost:5000"
 TEST_SERVICE_URL = "http://localhost:5001"  # This service
 API_KEY = "niggas123"  # API key for accessing Crafteri Auth API
 
+# Shared client: keeps connections to Crafteri Auth open and caches results
+auth_client = AuthClient(CRAFTERI_AUTH_URL, API_KEY)
+
 # Database configuration (using the same database as the auth service)
 DB_HOST = os.environ.get('DB_HOST', 'localhost')
 DB_PORT = os.environ.get('DB_PORT', '5432')
@@ -88,29 +96,12 @@ def init_db():
 
 def verify_crafteri_token(token):
     """Verify the token with Crafteri Auth Service"""
-    url = f"{CRAFTERI_AUTH_URL}/api/verify-token"
-    headers = {
-        "Content-Type": "application/json",
-        "X-API-Key": API_KEY
-    }
-    payload = {"token": token}
+    result = auth_client.verify_token(token)
     
-    logger.info(f"Sending token verification request to: {url}")
-    logger.info(f"Using API key: {API_KEY}")
-    
-    try:
-        response = requests.post(url, headers=headers, json=payload)
-        logger.info(f"Response status: {response.status_code}")
-        logger.info(f"Response body: {response.text}")
-        
-        if response.status_code == 200:
-            return response.json()
-        else:
-            logger.error(f"Token verification failed: {response.text}")
-            return None
-    except Exception as e:
-        logger.error(f"Error verifying token: {e}")
+    if not result['valid']:
+        logger.error(f"Token verification failed: {result['error']}")
         return None
+    return result
 
 def get_or_create_user(crafteri_user):
     """Get or create a user in the test service database"""
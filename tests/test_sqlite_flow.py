@@ -0,0 +1,117 @@
+import sys
+import uuid
+import pytest
+import backend  # noqa: F401
+import manage
+from backend import db, verifytoken
+
+# Imported through sys.modules: `backend.app` is shadowed by the Flask object
+app_module = sys.modules['backend.app']
+
+API_KEY = 'test-api-key'
+SERVICE_URL = 'http://service.test/callback'
+
+@pytest.fixture(scope='module')
+def client():
+    assert db.storage.name == 'sqlite'
+    assert app_module.init_app()
+    db.execute_query("""
+    INSERT INTO registered_services (name, domain, client_id, client_secret)
+    VALUES ('test', 'service.test', 'test-client', %s)
+    ON CONFLICT (domain) DO NOTHING
+    """, (API_KEY,), commit=True)
+    return app_module.app.test_client()
+
+def signup(client, email):
+    client.get(f'/signup?service={SERVICE_URL}')
+    response = client.post('/signup', data={'username': 'tester', 'email': email, 'password': 'correct horse'})
+    assert response.status_code == 302
+    return response.headers['Location'].split('token=', 1)[1]
+
+def verify(client, token):
+    return client.post('/api/verify-token', json={'token': token}, headers={'X-API-Key': API_KEY})
+
+def test_signup_verify_revoke(client):
+    email = f"{uuid.uuid4().hex[:8]}@example.com"
+    token = signup(client, email)
+    
+    response = verify(client, token)
+    assert response.status_code == 200
+    assert response.json['valid'] is True
+    assert response.json['user']['email'] == email
+    
+    response = client.post('/api/revoke-token', json={'token': token}, headers={'X-API-Key': API_KEY})
+    assert response.status_code == 200
+    assert response.json == {'success': True}
+    
+    response = verify(client, token)
+    assert response.status_code == 401
+    assert response.json == {'valid': False, 'error': 'Token revoked'}
+
+def test_login_after_signup(client):
+    email = f"{uuid.uuid4().hex[:8]}@example.com"
+    signup(client, email)
+    
+    client.get(f'/login?service={SERVICE_URL}')
+    response = client.post('/login', data={'email': email.upper(), 'password': 'correct horse'})
+    assert response.status_code == 302
+    
+    token = response.headers['Location'].split('token=', 1)[1]
+    assert verify(client, token).json['valid'] is True
+
+def test_duplicate_signup_rejected(client):
+    email = f"{uuid.uuid4().hex[:8]}@example.com"
+    signup(client, email)
+    
+    response = client.post('/signup', data={'username': 'tester', 'email': email.upper(), 'password': 'correct horse'})
+    assert response.status_code == 200
+    assert b'already exists' in response.data
+
+def test_verify_rejects_bad_requests(client):
+    assert verify(client, 'not-a-token').status_code == 401
+    response = client.post('/api/verify-token', json={'token': 'x'}, headers={'X-API-Key': 'wrong'})
+    assert response.status_code == 401
+
+@pytest.mark.parametrize('body', [[1], 'token', {'token': 5}, {'token': ''}, {}])
+def test_revoke_rejects_malformed_bodies(client, body):
+    response = client.post('/api/revoke-token', json=body, headers={'X-API-Key': API_KEY})
+    assert response.status_code == 400
+    assert response.json['success'] is False
+
+def test_batch_and_single_agree_on_deleted_user(client):
+    email = f"{uuid.uuid4().hex[:8]}@example.com"
+    token = signup(client, email)
+    
+    # Leave the token behind without its user, as if the account had been deleted
+    with db.storage.connection() as conn:
+        conn.execute("PRAGMA foreign_keys=OFF")
+        conn.execute("DELETE FROM users WHERE email = ?", (email,))
+        conn.commit()
+        conn.execute("PRAGMA foreign_keys=ON")
+    
+    # The batch goes first so neither answer comes from the verification cache
+    response = client.post('/api/verify-tokens', json={'tokens': [token]}, headers={'X-API-Key': API_KEY})
+    assert response.json['results'] == [{'valid': False, 'error': 'User not found'}]
+    
+    verifytoken.verify_cache.clear()
+    assert verify(client, token).json == {'valid': False, 'error': 'User not found'}
+
+def test_deactivated_service_rejected(client, monkeypatch):
+    token = signup(client, f"{uuid.uuid4().hex[:8]}@example.com")
+    assert verify(client, token).status_code == 200  # The service is now cached
+    (service_id,) = db.execute_query("SELECT id FROM registered_services WHERE client_secret = %s",
+                                     (API_KEY,), fetchone=True)
+    
+    monkeypatch.setattr(sys, 'argv', ['manage.py', 'deactivate-service', str(service_id)])
+    assert manage.main() == 0
+    try:
+        assert verify(client, token).status_code == 401
+    finally:
+        monkeypatch.setattr(sys, 'argv', ['manage.py', 'activate-service', str(service_id)])
+        assert manage.main() == 0
+    
+    assert verify(client, token).status_code == 200
+
+def test_unknown_service_not_activated(client, monkeypatch):
+    monkeypatch.setattr(sys, 'argv', ['manage.py', 'activate-service', '999999'])
+    assert manage.main() == 1
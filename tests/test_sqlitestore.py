@@ -0,0 +1,76 @@
+import datetime
+import pytest
+from backend.sqlitestore import SQLiteStorage, translate, bind
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = SQLiteStorage(tmp_path / 'auth.db', pool_size=2)
+    storage.connect()
+    yield storage
+    storage.close()
+
+def test_placeholders_become_question_marks():
+    sql, _ = translate("SELECT id FROM users WHERE email = %s AND username = %s")
+    assert sql == "SELECT id FROM users WHERE email = ? AND username = ?"
+
+def test_any_becomes_in_list():
+    sql, params = bind("SELECT id FROM users WHERE id = ANY(%s) AND email = %s", ([1, 2, 3], 'a@example.com'))
+    assert sql == "SELECT id FROM users WHERE id IN (?, ?, ?) AND email = ?"
+    assert params == [1, 2, 3, 'a@example.com']
+
+def test_empty_any_list_matches_nothing():
+    sql, params = bind("SELECT id FROM users WHERE id = ANY(%s)", ([],))
+    assert sql == "SELECT id FROM users WHERE id IN (NULL)"
+    assert params == []
+
+def test_localtimestamp_becomes_now():
+    sql, _ = translate("SELECT LOCALTIMESTAMP")
+    assert sql == 'SELECT NOW() AS "now [TIMESTAMP]"'
+
+def test_for_update_is_dropped():
+    sql, _ = translate("SELECT state FROM login_throttle WHERE key = %s FOR UPDATE")
+    assert sql == "SELECT state FROM login_throttle WHERE key = ?"
+
+def test_now_is_utc_timestamp(storage):
+    before = datetime.datetime.utcnow()
+    (now,) = storage.execute("SELECT LOCALTIMESTAMP", fetchone=True)
+    assert isinstance(now, datetime.datetime)
+    assert before <= now <= datetime.datetime.utcnow()
+
+def test_now_in_statements(storage):
+    storage.execute(
+        "INSERT INTO users (username, email, password_hash, last_login) VALUES (%s, %s, %s, NOW())",
+        ('alice', 'alice@example.com', 'x'), commit=True
+    )
+    (last_login,) = storage.execute("SELECT last_login FROM users WHERE email = %s", ('alice@example.com',), fetchone=True)
+    assert abs(datetime.datetime.utcnow() - last_login) < datetime.timedelta(seconds=5)
+
+def test_on_conflict_upsert(storage):
+    query = """
+    INSERT INTO registered_services (name, domain, client_id, client_secret)
+    VALUES (%s, %s, %s, %s)
+    ON CONFLICT (domain) DO UPDATE SET client_secret = EXCLUDED.client_secret
+    """
+    storage.execute(query, ('svc', 'svc.example.com', 'client-1', 'old'), commit=True)
+    storage.execute(query, ('svc', 'svc.example.com', 'client-2', 'new'), commit=True)
+    
+    rows = storage.execute("SELECT client_id, client_secret FROM registered_services", fetchall=True)
+    assert rows == [('client-1', 'new')]
+
+def test_any_query(storage):
+    storage.execute_many(
+        "INSERT INTO users (username, email, password_hash) VALUES (%s, %s, %s)",
+        [(name, f"{name}@example.com", 'x') for name in ('a', 'b', 'c')]
+    )
+    rows = storage.execute("SELECT username FROM users WHERE email = ANY(%s) ORDER BY username",
+                           (['a@example.com', 'c@example.com'],), fetchall=True)
+    assert rows == [('a',), ('c',)]
+
+def test_transaction_rolls_back_on_error(storage):
+    with pytest.raises(RuntimeError):
+        with storage.transaction() as cursor:
+            cursor.execute("INSERT INTO users (username, email, password_hash) VALUES (%s, %s, %s)",
+                           ('bob', 'bob@example.com', 'x'))
+            raise RuntimeError("abort")
+    
+    assert storage.execute("SELECT COUNT(*) FROM users", fetchone=True) == (0,)
@@ -0,0 +1,22 @@
+import uuid
+from backend import db, throttle
+
+def test_short_keys_kept_readable():
+    assert throttle.throttle_key('email', 'alice@example.com') == 'email:alice@example.com'
+
+def test_long_keys_hashed():
+    key = throttle.throttle_key('email', 'a' * 5000 + '@example.com')
+    assert key.startswith('email:sha256:')
+    assert len(key) <= throttle.THROTTLE_KEY_MAX_LENGTH
+    assert key == throttle.throttle_key('email', 'a' * 5000 + '@example.com')
+
+def test_database_backend_with_long_email():
+    assert db.init_db()
+    login_throttle = throttle.LoginThrottle(throttle.DatabaseBackend())
+    email = f"{uuid.uuid4().hex}{'a' * 5000}@example.com"
+    
+    assert login_throttle.check(email, '203.0.113.7') == 0
+    login_throttle.record_failure(email)
+    
+    (key,) = db.execute_query("SELECT key FROM login_throttle WHERE key LIKE %s", ('email:sha256:%',), fetchone=True)
+    assert len(key) <= throttle.THROTTLE_KEY_MAX_LENGTH